@@ -1,6 +1,12 @@
 import os
 import re
 import json
+import argparse
+import hashlib
+from multiprocessing import Pool
+
+from abs_archive import AbsArchive, pack_abstracts
+from records import iter_records, write_records
 
 """
 This script extracts relevant information from the abstract files of scientific papers.
@@ -13,11 +19,28 @@ the script does the following:
 1. Reads each .abs file in the specified directory.
 2. Parses the content to extract fields like paper ID, authors, title, abstract, and other metadata.
 3. Cleans and formats the extracted data.
+
+usage:
+    python First_Extraction.py                 # sequential, writes temp/output.json
+    python First_Extraction.py --parallel      # process pool, streams temp/output.jsonl (one record per line)
+    python First_Extraction.py --incremental   # only re-parse new/changed files, merge into the output
+    python First_Extraction.py --pack temp/abstracts.pack     # one-time: pack all .abs files into one archive
+    python First_Extraction.py --archive temp/abstracts.pack  # extract from the archive (add --parallel for a pool)
 """
 
 def parse_abs_file(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
         content = f.read()
+    return parse_abs_content(content, os.path.basename(filepath))
+
+
+def parse_abs_content(content, name=''):
+    """
+    Parse the text of one .abs file. content can also be bytes or a memoryview
+    (e.g. a slice of the packed archive, see abs_archive.py); name is only used in the messages.
+    """
+    if not isinstance(content, str):
+        content = str(content, 'utf-8')
 
     #delete the first two lines and the last line
     lines = content.splitlines()
@@ -74,12 +97,12 @@ def parse_abs_file(filepath):
                 if current_key:
                     data[current_key] = (data[current_key] or '') + ' ' + stripped
                 else:
-                 print(f"[line inidentified] file {os.path.basename(filepath)}: {stripped}")
+                 print(f"[line inidentified] file {name}: {stripped}")
         else:
             if current_key:
                 data[current_key] = (data[current_key] or '') + ' ' + stripped
             else:
-                print(f"[line inidentified] file {os.path.basename(filepath)}: {stripped}")
+                print(f"[line inidentified] file {name}: {stripped}")
 
 
     for key in data:
@@ -125,12 +148,238 @@ def process_all_years(base_dir, start_year=1992, end_year=2003):
     return all_records
 
 
-base_directory = 'assets/cit-HepTh-abstracts' 
 
-results = process_all_years(base_directory)
-
-
-with open('temp/output.json', 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-
-print(f"Finish. In total of {len(results)} records, saved to temp/output.json。")
\ No newline at end of file
+def iter_abs_files(base_dir, start_year=1992, end_year=2003):
+    """Yield (year, filepath) for every .abs file, year by year."""
+    for year in range(start_year, end_year + 1):
+        year_dir = os.path.join(base_dir, str(year))
+        if not os.path.exists(year_dir):
+            print(f"warning:document {year_dir} does not exist.")
+            continue
+        for filename in sorted(os.listdir(year_dir)):
+            if filename.endswith('.abs'):
+                yield year, os.path.join(year_dir, filename)
+
+
+def _parse_one(item):
+    year, filepath = item
+    try:
+        record = parse_abs_file(filepath)
+        record['year'] = year
+        return record
+    except Exception as e:
+        print(f"file {os.path.basename(filepath)} analyse failed: {e}")
+        return None
+
+
+def _parse_batch(batch):
+    # runs in a worker process: parse a shard of (year, filepath) pairs
+    records = [_parse_one(item) for item in batch]
+    return [r for r in records if r is not None]
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_all_years_parallel(base_dir, output_path, start_year=1992, end_year=2003,
+                               workers=None, batch_size=256):
+    """
+    Parallel version of process_all_years.
+    The files are sharded into batches of batch_size and parsed by a process pool;
+    each record is written to output_path as one JSON line as soon as its batch is done,
+    so the memory stays flat and a crash keeps everything already written.
+    The order of the lines is not guaranteed.
+    Returns the number of records written.
+    """
+    files = iter_abs_files(base_dir, start_year, end_year)
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as f, Pool(workers) as pool:
+        for records in pool.imap_unordered(_parse_batch, _batches(files, batch_size)):
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            count += len(records)
+    return count
+
+
+
+def load_records(path):
+    """Read records from a .json list or a .jsonl file (one record per line)."""
+    return list(iter_records(path))
+
+
+def save_records(path, records):
+    write_records(path, records)
+
+
+def manifest_path_for(output_path):
+    # temp/output.json -> temp/output_manifest.json
+    return os.path.splitext(output_path)[0] + '_manifest.json'
+
+
+def file_hash(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def process_incremental(base_dir, output_path, start_year=1992, end_year=2003, workers=None):
+    """
+    Re-parse only the .abs files that are new or changed since the last run.
+
+    A manifest {relative path: {size, mtime, sha1, paper_id}} is kept next to the output.
+    A file whose size and mtime are unchanged is skipped without being read; otherwise it is
+    hashed and re-parsed only if the content differs. Records of deleted files are dropped,
+    and the result is merged into the existing output (.json or .jsonl).
+    The records are keyed by file, like the manifest, so two files with the same paper_id both
+    stay, as in a full run. The output holds one record per manifest entry having a "paper_id"
+    key (the files parsed successfully), in the manifest order.
+    Without a manifest (first run), or when it does not match the output, everything is parsed.
+    Returns (number of records, number of re-parsed files, number of deleted files).
+    """
+    manifest_path = manifest_path_for(output_path)
+    old_manifest = {}
+    records = {}
+    if os.path.exists(manifest_path) and os.path.exists(output_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            old_manifest = json.load(f)
+        with_record = [p for p, e in old_manifest.items() if 'paper_id' in e]
+        old_records = load_records(output_path)
+        if len(old_records) == len(with_record) and all(
+                r.get('paper_id') == old_manifest[p]['paper_id'] for p, r in zip(with_record, old_records)):
+            records = dict(zip(with_record, old_records))
+        else:
+            old_manifest = {}
+
+    new_manifest = {}
+    changed = []
+    for year, filepath in iter_abs_files(base_dir, start_year, end_year):
+        relpath = os.path.relpath(filepath, base_dir)
+        st = os.stat(filepath)
+        entry = {'size': st.st_size, 'mtime': st.st_mtime_ns}
+        old = old_manifest.get(relpath)
+        known = old is not None and relpath in records
+        if known and old['size'] == entry['size'] and old['mtime'] == entry['mtime']:
+            new_manifest[relpath] = old
+            continue
+        entry['sha1'] = file_hash(filepath)
+        if known and old['sha1'] == entry['sha1']:
+            # touched but not modified
+            entry['paper_id'] = old['paper_id']
+            new_manifest[relpath] = entry
+            continue
+        records.pop(relpath, None)
+        new_manifest[relpath] = entry
+        changed.append((year, filepath))
+
+    deleted = [p for p in old_manifest if p not in new_manifest]
+    for relpath in deleted:
+        records.pop(relpath, None)
+
+    if workers == 1 or len(changed) < 256:
+        parsed = [_parse_one(item) for item in changed]
+    else:
+        with Pool(workers) as pool:
+            parsed = list(pool.imap(_parse_one, changed, chunksize=64))
+
+    for (year, filepath), record in zip(changed, parsed):
+        if record is not None:
+            relpath = os.path.relpath(filepath, base_dir)
+            new_manifest[relpath]['paper_id'] = record.get('paper_id')
+            records[relpath] = record
+
+    # keep the year/file order of the corpus
+    ordered = [records[p] for p in new_manifest if p in records]
+    save_records(output_path, ordered)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(new_manifest, f)
+    return len(ordered), len(changed), len(deleted)
+
+
+
+def _parse_archive_range(task):
+    # runs in a worker process: every worker maps the archive itself
+    archive_path, start, stop = task
+    records = []
+    with AbsArchive(archive_path) as archive:
+        for paper_id, year, raw in archive.items(start, stop):
+            try:
+                record = parse_abs_content(raw, paper_id + '.abs')
+                record['year'] = year
+                records.append(record)
+            except Exception as e:
+                print(f"file {paper_id}.abs analyse failed: {e}")
+            finally:
+                raw.release()
+    return records
+
+
+def process_archive(archive_path, output_path, workers=1, batch_size=1024):
+    """
+    Extract the records from a packed archive (see abs_archive.py) instead of the per-year folders.
+    With workers != 1 the archive is split into ranges of batch_size files parsed by a process pool.
+    The records are written to output_path (.json or .jsonl). Returns the number of records.
+    """
+    with AbsArchive(archive_path) as archive:
+        n_files = len(archive)
+    tasks = [(archive_path, start, start + batch_size) for start in range(0, n_files, batch_size)]
+    if workers == 1:
+        records = [r for task in tasks for r in _parse_archive_range(task)]
+    else:
+        with Pool(workers) as pool:
+            records = [r for batch in pool.imap(_parse_archive_range, tasks) for r in batch]
+    save_records(output_path, records)
+    return len(records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="extract the .abs files to json")
+    parser.add_argument('--parallel', action='store_true',
+                        help="parse with a process pool and stream the records to a .jsonl file")
+    parser.add_argument('--incremental', action='store_true',
+                        help="re-parse only new or changed files (manifest kept next to the output)")
+    parser.add_argument('--pack', metavar='ARCHIVE',
+                        help="pack all the .abs files into one archive file and exit")
+    parser.add_argument('--archive', metavar='ARCHIVE',
+                        help="extract from a packed archive instead of the per-year folders")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    base_directory = 'assets/cit-HepTh-abstracts'
+
+    if args.pack:
+        n = pack_abstracts(iter_abs_files(base_directory), args.pack)
+        print(f"Finish. {n} files packed into {args.pack}。")
+    elif args.archive:
+        output_path = args.output or 'temp/output.json'
+        workers = args.workers if args.parallel else 1
+        n = process_archive(args.archive, output_path, workers=workers)
+        print(f"Finish. In total of {n} records, saved to {output_path}。")
+    elif args.incremental:
+        output_path = args.output or ('temp/output.jsonl' if args.parallel else 'temp/output.json')
+        n, n_changed, n_deleted = process_incremental(base_directory, output_path, workers=args.workers)
+        print(f"Finish. {n_changed} files re-parsed, {n_deleted} removed, "
+              f"in total of {n} records, saved to {output_path}。")
+    elif args.parallel:
+        output_path = args.output or 'temp/output.jsonl'
+        n = process_all_years_parallel(base_directory, output_path,
+                                       workers=args.workers, batch_size=args.batch_size)
+        print(f"Finish. In total of {n} records, saved to {output_path}。")
+    else:
+        output_path = args.output or 'temp/output.json'
+        results = process_all_years(base_directory)
+
+        with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+        print(f"Finish. In total of {len(results)} records, saved to {output_path}。")
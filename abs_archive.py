@@ -0,0 +1,105 @@
+import os
+import mmap
+import numpy as np
+
+"""
+Packed archive of the raw .abs files.
+
+The corpus is ~29k tiny files in per-year folders, so reading it is dominated by the
+open/stat/close of every file. pack_abstracts concatenates all of them once into a single
+file (temp/abstracts.pack) and writes a compact offset index next to it
+(temp/abstracts_index.npz: paper id, year, offset, length as numpy arrays).
+
+AbsArchive memory-maps the pack and returns zero-copy memoryview slices, which can be given
+directly to parse_abs_content in First_Extraction.py. Lookup by paper id is a dict access.
+
+    from First_Extraction import iter_abs_files
+    pack_abstracts(iter_abs_files('assets/cit-HepTh-abstracts'), 'temp/abstracts.pack')
+
+    with AbsArchive('temp/abstracts.pack') as archive:
+        raw = archive.get('9201001')        # memoryview of the bytes of 9201001.abs
+"""
+
+
+def index_path_for(archive_path):
+    # temp/abstracts.pack -> temp/abstracts_index.npz
+    return os.path.splitext(archive_path)[0] + '_index.npz'
+
+
+def pack_abstracts(files, archive_path='temp/abstracts.pack'):
+    """
+    files: iterable of (year, filepath) pairs, e.g. iter_abs_files(base_dir)
+    Concatenate the files into archive_path and save the offset index. Returns the number of files.
+    """
+    ids, years, offsets, lengths = [], [], [], []
+    offset = 0
+    with open(archive_path, 'wb') as out:
+        for year, filepath in files:
+            with open(filepath, 'rb') as f:
+                content = f.read()
+            out.write(content)
+            ids.append(os.path.splitext(os.path.basename(filepath))[0])
+            years.append(year)
+            offsets.append(offset)
+            lengths.append(len(content))
+            offset += len(content)
+
+    np.savez(index_path_for(archive_path),
+             ids=np.array(ids, dtype=str),
+             years=np.array(years, dtype=np.int16),
+             offsets=np.array(offsets, dtype=np.int64),
+             lengths=np.array(lengths, dtype=np.int32))
+    return len(ids)
+
+
+class AbsArchive:
+    def __init__(self, archive_path='temp/abstracts.pack'):
+        index = np.load(index_path_for(archive_path))
+        self.ids = index['ids']
+        self.years = index['years']
+        self.offsets = index['offsets']
+        self.lengths = index['lengths']
+        self.position = {pid: i for i, pid in enumerate(self.ids.tolist())}
+
+        self._file = open(archive_path, 'rb')
+        if os.path.getsize(archive_path) > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mmap = b''  # mmap cannot map an empty file
+        self._view = memoryview(self._mmap)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, paper_id):
+        return paper_id in self.position
+
+    def slice(self, i):
+        """Zero-copy view of the i-th packed file."""
+        start = int(self.offsets[i])
+        return self._view[start:start + int(self.lengths[i])]
+
+    def get(self, paper_id):
+        i = self.position.get(paper_id)
+        return None if i is None else self.slice(i)
+
+    def items(self, start=0, stop=None):
+        """Yield (paper_id, year, view) in the order of the pack, i.e. one sequential read."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield str(self.ids[i]), int(self.years[i]), self.slice(i)
+
+    def close(self):
+        self._view.release()
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # slices still held by the caller, the map is freed with them
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,119 @@
+import argparse
+import numpy as np
+import scipy.sparse as sp
+
+"""
+Citation statistics of the authors, from the papers x authors incidence of coauthor_graph.py and
+the papers x papers citation matrix of citation_flow.py (C[p, q] = 1 if paper p cites paper q).
+
+    P = coauthors.attribution(mode)   papers x authors ("all", "first" or "fractional")
+    c = C^T 1                          citations received by every paper
+
+    citations         P^T c               citations received by every author
+    h_index           largest h such that h papers of the author have >= h citations each
+    flow              P^T C P             flow[a, b] = citations from the papers of a to the papers of b
+    co_citation       (C P)^T (C P)       [a, b] = how often a and b are cited by the same paper
+    coupling          (P^T C)(P^T C)^T    [a, b] = how often papers of a and of b cite the same paper
+
+All of them are computed for every author at once; the authors argument (names or row numbers)
+restricts the rows to the authors asked for, which is what the pairwise matrices need for large
+sets of authors. The diagonal of co_citation and coupling (an author with themself) is dropped.
+
+    C = citation_matrix(citation_csr, coauthors.paper_ids)
+    analytics = AuthorCitations(coauthors, C)
+    analytics.citations()[coauthors.index["Edward Witten"]]
+    analytics.h_index(["Edward Witten", "Cumrun Vafa"])
+    analytics.most_cited_in(lc_labels)             # most cited author of each community
+"""
+
+
+class AuthorCitations:
+    def __init__(self, coauthors, citations):
+        self.coauthors = coauthors
+        self.C = citations.tocsr()
+        self.paper_citations = np.asarray(self.C.sum(axis=0)).ravel()
+
+    def rows(self, authors=None):
+        """Row numbers of authors (names or row numbers), all the authors for None."""
+        if authors is None:
+            return np.arange(self.coauthors.n_authors)
+        index = self.coauthors.index
+        return np.array([index[a] if isinstance(a, str) else a for a in authors], dtype=np.int64)
+
+    def _attribution(self, mode, authors=None):
+        P = self.coauthors.attribution(mode)
+        return P if authors is None else P[:, self.rows(authors)]
+
+    def citations(self, authors=None, mode="all"):
+        """Citations received by the papers of every author (float with mode="fractional")."""
+        counts = self._attribution(mode, authors).T @ self.paper_citations
+        return counts if mode == "fractional" else counts.astype(np.int64)
+
+    def h_index(self, authors=None):
+        """h-index of every author: in each row, the citations of their papers sorted in decreasing order."""
+        by_author = self.coauthors.incidence.T.tocsr()[self.rows(authors)]
+        row = np.repeat(np.arange(by_author.shape[0]), np.diff(by_author.indptr))
+        cites = self.paper_citations[by_author.indices]
+        order = np.lexsort((-cites, row))
+        # rank of each paper among the papers of its author, by decreasing citations
+        rank = np.arange(len(order)) - by_author.indptr[row[order]] + 1
+        return np.bincount(row[order][cites[order] >= rank], minlength=by_author.shape[0])
+
+    def flow(self, authors=None, mode="all"):
+        """authors x authors sparse matrix of the citations (rows: citing authors, restricted to authors)."""
+        P = self.coauthors.attribution(mode)
+        return (self._attribution(mode, authors).T @ self.C @ P).tocsr()
+
+    def co_citation(self, authors=None, mode="all"):
+        """authors x authors co-citation strength (rows restricted to authors)."""
+        CP = (self.C @ self.coauthors.attribution(mode)).tocsc()
+        rows = CP if authors is None else CP[:, self.rows(authors)]
+        return _drop_self(rows.T @ CP, self.rows(authors))
+
+    def coupling(self, authors=None, mode="all"):
+        """authors x authors bibliographic-coupling strength (rows restricted to authors)."""
+        R = (self.coauthors.attribution(mode).T @ self.C).tocsr()
+        rows = R if authors is None else R[self.rows(authors)]
+        return _drop_self(rows @ R.T, self.rows(authors))
+
+    def most_cited_in(self, labels, n_communities=None):
+        """Row of the most cited author of every community (-1 for an empty one)."""
+        labels = np.asarray(labels)
+        if n_communities is None:
+            n_communities = int(labels.max()) + 1 if len(labels) else 0
+        citations = self.citations()
+        members = np.flatnonzero(labels >= 0)
+        # by community, then by decreasing citations: the first author of each community wins
+        order = members[np.lexsort((-citations[members], labels[members]))]
+        best = np.full(n_communities, -1, dtype=np.int64)
+        community = labels[order]
+        first = np.r_[True, community[1:] != community[:-1]]
+        best[community[first]] = order[first]
+        return best
+
+
+def _drop_self(M, rows):
+    """Zero M[i, rows[i]] (the pair of an author with themself) in a sparse matrix."""
+    M = M.tocoo()
+    keep = M.col != rows[M.row]
+    return sp.csr_matrix((M.data[keep], (M.row[keep], M.col[keep])), shape=M.shape)
+
+
+if __name__ == '__main__':
+    import json
+    from citation_graph import load_citation_graph
+    from citation_flow import citation_matrix
+    from coauthor_graph import CoauthorGraph
+
+    parser = argparse.ArgumentParser(description="Most cited authors and their h-index")
+    parser.add_argument("--papers", default="temp/papers_standardized.json")
+    parser.add_argument("--citations", default="assets/Cit-HepTh.txt")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.papers, "r", encoding="utf-8") as f:
+        coauthors = CoauthorGraph.from_papers(json.load(f))
+    analytics = AuthorCitations(coauthors, citation_matrix(load_citation_graph(args.citations), coauthors.paper_ids))
+    citations, h = analytics.citations(), analytics.h_index()
+    for i in np.argsort(-citations, kind='stable')[:args.top].tolist():
+        print(f"{coauthors.authors[i]}: {citations[i]} citations, h-index {h[i]}")
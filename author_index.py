@@ -0,0 +1,118 @@
+import csv
+import json
+import sys
+
+from standarniee_name import parse_name, block_keys, pick_standard_name, UnionFind
+
+"""
+Incremental version of standarniee_name.py.
+
+Instead of regenerating temp/authors.csv and rerunning the whole union-find pass, the groups
+already saved in temp/author_variants.json are loaded into an AuthorVariantIndex, the new raw
+names are inserted with the same is_variant rules (through the same last-name / initial blocks
+as merge_variants), and the standard name is picked again only for the groups that changed.
+
+usage:
+    python author_index.py new_authors.csv      # csv with an 'authors' column, like temp/authors.csv
+
+output:
+1. temp/author_variants.json is updated in place (same format).
+2. temp/author_variants_delta.json: the names added, the new groups and the changed groups.
+"""
+
+
+class AuthorVariantIndex:
+    def __init__(self):
+        self.groups = {}      # standard name -> set of variants
+        self.group_of = {}    # variant -> standard name
+        self.blocks = {}      # (lowercase last name, block key) -> one variant of the group
+
+    @classmethod
+    def load(cls, path='temp/author_variants.json'):
+        index = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            author_variants = json.load(f)
+        for standard_name, variants in author_variants.items():
+            index.groups[standard_name] = set(variants)
+            for name in variants:
+                index.group_of[name] = standard_name
+                first_names, last_name = parse_name(name)
+                for key in block_keys((first_names, last_name)):
+                    index.blocks.setdefault((last_name.lower(), key), name)
+        return index
+
+    def add_names(self, raw_names):
+        """
+        Insert a batch of raw names and merge them into the existing groups.
+        Returns the delta report:
+            {"added": [...], "new_groups": {standard: [variants]},
+             "changed_groups": {standard: {"previous": [old standard names], "variants": [...]}}}
+        """
+        # same cleaning as standarniee_name.py
+        names = []
+        seen = set()
+        for raw in raw_names:
+            name = (raw if isinstance(raw, str) else '').strip().title()
+            if name not in self.group_of and name not in seen:
+                seen.add(name)
+                names.append(name)
+
+        # the union-find works on group ids: the standard names of the existing groups and the new names
+        uf = UnionFind()
+        for name in names:
+            uf.find(name)
+            first_names, last_name = parse_name(name)
+            for key in block_keys((first_names, last_name)):
+                block = (last_name.lower(), key)
+                member = self.blocks.get(block)
+                if member is None:
+                    self.blocks[block] = name
+                else:
+                    uf.union(self.group_of.get(member, member), name)
+
+        merged = {}
+        for group_id in uf.parent:
+            merged.setdefault(uf.find(group_id), []).append(group_id)
+
+        delta = {'added': sorted(names), 'new_groups': {}, 'changed_groups': {}}
+        for members in merged.values():
+            previous = sorted(m for m in members if m in self.groups)
+            variants = set(m for m in members if m not in self.groups)
+            for old_standard in previous:
+                variants |= self.groups.pop(old_standard)
+
+            # 只对变化的组重新选择标准名
+            # re-pick the standard name only for the changed groups
+            standard_name = pick_standard_name(sorted(variants))
+            self.groups[standard_name] = variants
+            for name in variants:
+                self.group_of[name] = standard_name
+
+            if previous:
+                delta['changed_groups'][standard_name] = {'previous': previous, 'variants': sorted(variants)}
+            else:
+                delta['new_groups'][standard_name] = sorted(variants)
+        return delta
+
+    def standardize(self, name):
+        return self.group_of.get(name, name)
+
+    def save(self, path='temp/author_variants.json'):
+        author_variants = {s: sorted(v) for s, v in self.groups.items()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(author_variants, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'r', encoding='utf-8', newline='') as f:
+        new_names = [row['authors'] for row in csv.DictReader(f)]
+
+    index = AuthorVariantIndex.load('temp/author_variants.json')
+    delta = index.add_names(new_names)
+    index.save('temp/author_variants.json')
+
+    with open('temp/author_variants_delta.json', 'w', encoding='utf-8') as f:
+        json.dump(delta, f, ensure_ascii=False, indent=4)
+
+    print(f"{len(delta['added'])} names added, {len(delta['new_groups'])} new groups, "
+          f"{len(delta['changed_groups'])} groups changed. Saved to temp/author_variants.json")
@@ -0,0 +1,215 @@
+import math
+import random
+import argparse
+import numpy as np
+from multiprocessing import Pool
+
+"""
+Betweenness centrality on the CSR arrays of citation_graph.py.
+
+Brandes' algorithm, one breadth-first search per source, vectorised level by level with numpy:
+the frontier is expanded with one gather over the CSR arrays, the path counts sigma are summed
+with bincount, and the dependencies delta are accumulated backwards over the same level edges.
+
+The sources are sampled exactly like nx.betweenness_centrality(G, k, seed) when G is the graph
+of CSRGraph.to_networkx() (same node order), and the values are rescaled the same way, so
+betweenness_centrality(graph, k=100, seed=42) gives the numbers of keyword.ipynb (up to float
+rounding). The sources are cut into fixed chunks shared by a process pool and the partial sums
+are added in chunk order, so the result does not depend on the number of workers.
+
+    graph = load_citation_graph()
+    bc = betweenness_centrality(graph, k=2000, seed=42, workers=8)    # array, dense indices
+    bc = graph.to_dict(bc)                                            # {paper_id: value}
+
+    # estimates with a 95% error bound every 64 sources, stop when the top 10 is stable
+    for n_sources, top in progressive_betweenness(graph, k=2000, seed=42, top=10, rtol=0.05):
+        print(n_sources, top[0])
+"""
+
+CHUNK_SIZE = 32
+
+
+def sample_sources(n, k=None, seed=None):
+    """The k sources nx.betweenness_centrality samples among n nodes (all of them if k is None)."""
+    if k is None or k == n:
+        return list(range(n))
+    rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+    # random.sample only depends on the length of the population
+    return rng.sample(range(n), k)
+
+
+def _expand(indptr, indices, frontier):
+    """(src, dst) of all the edges leaving the nodes of frontier."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    src = np.repeat(frontier, counts)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return src, indices[offsets + np.arange(total)]
+
+
+def single_source_dependencies(indptr, indices, s):
+    """
+    Brandes dependencies delta_s(v) of every node for the source s (delta_s(s) = 0).
+    Returns (delta, reached) where reached is the number of nodes reached from s.
+    """
+    n = len(indptr) - 1
+    dist = np.full(n, -1, dtype=np.int32)
+    sigma = np.zeros(n, dtype=np.float64)
+    dist[s] = 0
+    sigma[s] = 1.0
+    frontier = np.array([s], dtype=np.int64)
+    levels = []
+    reached = 1
+    d = 0
+    while frontier.size:
+        src, dst = _expand(indptr, indices, frontier)
+        new = np.unique(dst[dist[dst] < 0])
+        dist[new] = d + 1
+        # keep the edges of shortest paths: from level d to level d + 1
+        keep = dist[dst] == d + 1
+        src, dst = src[keep], dst[keep]
+        sigma += np.bincount(dst, weights=sigma[src], minlength=n)
+        levels.append((src, dst))
+        reached += new.size
+        frontier = new
+        d += 1
+
+    delta = np.zeros(n, dtype=np.float64)
+    for src, dst in reversed(levels):
+        delta += np.bincount(src, weights=sigma[src] / sigma[dst] * (1.0 + delta[dst]), minlength=n)
+    delta[s] = 0.0
+    return delta, reached
+
+
+# 每个进程的图
+# the graph of each worker process
+_worker = {}
+
+
+def _init_worker(indptr, indices):
+    _worker["indptr"] = indptr
+    _worker["indices"] = indices
+
+
+def _chunk_sums(sources):
+    """sum and sum of squares of the dependencies of a chunk of sources."""
+    indptr, indices = _worker["indptr"], _worker["indices"]
+    n = len(indptr) - 1
+    total = np.zeros(n, dtype=np.float64)
+    squares = np.zeros(n, dtype=np.float64)
+    for s in sources:
+        delta, _ = single_source_dependencies(indptr, indices, s)
+        total += delta
+        squares += delta * delta
+    return total, squares
+
+
+def _iter_chunk_sums(graph, sources, workers, chunk_size):
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+    indptr, indices = np.asarray(graph.indptr), np.asarray(graph.indices)
+    if workers == 1:
+        _init_worker(indptr, indices)
+        for chunk in chunks:
+            yield len(chunk), _chunk_sums(chunk)
+        return
+    with Pool(workers, initializer=_init_worker, initargs=(indptr, indices)) as pool:
+        # imap keeps the chunk order, so the sums are added in the same order for any number of workers
+        for chunk, sums in zip(chunks, pool.imap(_chunk_sums, chunks)):
+            yield len(chunk), sums
+
+
+def rescale_factors(n, sources, normalized=True, directed=True, sampled=True):
+    """
+    Per-node factors of nx's _rescale (endpoints=False): sampled sources are rescaled with k - 1
+    since they cannot be an endpoint of their own paths.
+    """
+    N = n - 1
+    factors = np.ones(n, dtype=np.float64)
+    if N < 2:
+        return factors
+    correction = 1 if directed else 2
+    if not sampled:
+        factors[:] = 1 / (N * (N - 1)) if normalized else N / (N * correction)
+        return factors
+    k = len(sources)
+    if normalized:
+        scale_source = 1 / ((k - 1) * (N - 1)) if k > 1 else math.nan
+        scale_nonsource = 1 / (k * (N - 1))
+    else:
+        scale_source = N / ((k - 1) * correction) if k > 1 else math.nan
+        scale_nonsource = N / (k * correction)
+    factors[:] = scale_nonsource
+    factors[np.asarray(sources, dtype=np.int64)] = scale_source
+    return factors
+
+
+def betweenness_centrality(graph, k=None, seed=None, normalized=True, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Betweenness centrality of every node of a CSRGraph (array indexed like graph.ids), the same
+    as nx.betweenness_centrality(graph.to_networkx(), k, normalized, seed=seed).
+    """
+    n = graph.n_nodes
+    sources = sample_sources(n, k, seed)
+    betweenness = np.zeros(n, dtype=np.float64)
+    for _, (total, _) in _iter_chunk_sums(graph, sources, workers, chunk_size):
+        betweenness += total
+    sampled = k is not None and k != n
+    return betweenness * rescale_factors(n, sources, normalized, graph.directed, sampled)
+
+
+def progressive_betweenness(graph, k, seed=None, top=10, normalized=True, workers=1,
+                            chunk_size=64, z=1.96, rtol=None):
+    """
+    Betweenness estimated from more and more of the k sampled sources.
+
+    After each chunk, yields (n_sources, [(paper_id, estimate, bound), ...]) for the top nodes,
+    where bound is the half-width of a normal confidence interval (z=1.96: 95%) computed from
+    the spread of the per-source dependencies. With rtol, stops as soon as every bound of the top
+    is below rtol * estimate. The last estimate (all k sources) is betweenness_centrality(graph, k, seed).
+    """
+    n = graph.n_nodes
+    sources = sample_sources(n, k, seed)
+    total = np.zeros(n, dtype=np.float64)
+    squares = np.zeros(n, dtype=np.float64)
+    ids = graph.ids
+    m = 0
+    for size, (chunk_total, chunk_squares) in _iter_chunk_sums(graph, sources, workers, chunk_size):
+        total += chunk_total
+        squares += chunk_squares
+        m += size
+        factors = rescale_factors(n, sources[:m], normalized, graph.directed, sampled=m < n)
+        estimate = total * factors
+        # standard error of a sum of m sampled dependencies
+        variance = np.maximum(squares / m - (total / m) ** 2, 0.0)
+        bound = z * factors * np.sqrt(m * variance) if m > 1 else np.full(n, np.inf)
+        best = np.argsort(-estimate, kind='stable')[:top]
+        yield m, [(str(ids[i]), float(estimate[i]), float(bound[i])) for i in best.tolist()]
+        if rtol is not None and np.all(bound[best] <= rtol * estimate[best]):
+            break
+
+
+if __name__ == '__main__':
+    from citation_graph import load_citation_graph
+
+    parser = argparse.ArgumentParser(description="sampled betweenness centrality of the citation graph")
+    parser.add_argument("--citations", default="assets/Cit-HepTh.txt")
+    parser.add_argument("-k", type=int, default=100, help="number of sampled sources")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--progressive", action="store_true",
+                        help="print the top estimates with their error bounds while the sources are processed")
+    parser.add_argument("--rtol", type=float, default=None, help="with --progressive, stop at this relative error")
+    args = parser.parse_args()
+
+    graph = load_citation_graph(args.citations)
+    if args.progressive:
+        for n_sources, top in progressive_betweenness(graph, args.k, args.seed, args.top,
+                                                      workers=args.workers, rtol=args.rtol):
+            pid, score, bound = top[0]
+            print(f"{n_sources} sources, top paper {pid}: {score:.4f} ± {bound:.4f}")
+    else:
+        top = betweenness_centrality(graph, args.k, args.seed, workers=args.workers)
+        for i in np.argsort(-top, kind='stable')[:args.top].tolist():
+            print(f'Paper ID: {graph.ids[i]}, Betweenness Centrality: {top[i]:.4f}')
@@ -0,0 +1,164 @@
+import os
+import json
+import numpy as np
+
+"""
+Array-backed graphs for the SNAP edge lists (assets/Cit-HepTh.txt, assets/CA-HepTh.txt).
+
+The edge list is parsed in one go with numpy, the node ids are mapped to dense indices
+0..n-1 (sorted ids), and the edges are stored as forward and reverse CSR adjacency arrays:
+
+    successors of node i:    indices[indptr[i]:indptr[i + 1]]
+    predecessors of node i:  rindices[rindptr[i]:rindptr[i + 1]]
+
+Cit-HepTh.txt omits the leading zeros of the arXiv numbers (1001 for 0001001), so the paper
+ids are zero-padded to 7 digits to match the paper_id of temp/papers_standardized.json.
+
+The arrays are cached as .npy files in temp/graph_cache/<name>/ and memory-mapped on the next
+load, which takes milliseconds. The cache is rebuilt when the size or mtime of the source changes.
+
+    G = load_citation_graph()                   # CSRGraph
+    i = G.index['9211012']; G.successors(i)
+    nxG = G.to_networkx()                       # for the visualisation code
+"""
+
+CACHE_DIR = 'temp/graph_cache'
+ARRAYS = ('ids', 'indptr', 'indices', 'rindptr', 'rindices')
+
+
+def read_edge_list(path):
+    """(m, 2) int64 array of the edges of a SNAP edge list (lines starting with # are skipped)."""
+    with open(path, 'rb') as f:
+        lines = [line for line in f if not line.startswith(b'#')]
+    return np.array(b''.join(lines).split(), dtype=np.int64).reshape(-1, 2)
+
+
+def build_csr(src, dst, n):
+    """indptr, indices of the edges src -> dst over n nodes, neighbours sorted."""
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+class CSRGraph:
+    def __init__(self, ids, indptr, indices, rindptr, rindices, directed=True):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.rindptr = rindptr
+        self.rindices = rindices
+        self.directed = directed
+        self._index = None
+
+    @classmethod
+    def from_edges(cls, edges, pad=0, directed=True):
+        """Build from an (m, 2) array of raw ids. Duplicate edges are kept once."""
+        raw_ids, inverse = np.unique(edges, return_inverse=True)
+        inverse = inverse.reshape(-1, 2)
+        n = len(raw_ids)
+        src, dst = inverse[:, 0], inverse[:, 1]
+        if not directed:
+            src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+        keys = np.unique(src * n + dst)
+        src, dst = keys // n, keys % n
+
+        ids = np.array([str(x).zfill(pad) for x in raw_ids.tolist()])
+        indptr, indices = build_csr(src, dst, n)
+        if directed:
+            rindptr, rindices = build_csr(dst, src, n)
+        else:
+            rindptr, rindices = indptr, indices
+        return cls(ids, indptr, indices, rindptr, rindices, directed)
+
+    @property
+    def n_nodes(self):
+        return len(self.ids)
+
+    @property
+    def n_edges(self):
+        m = len(self.indices)
+        if self.directed:
+            return m
+        src, dst = self.edges()
+        return (m + int(np.count_nonzero(src == dst))) // 2  # a self-loop is stored once
+
+    @property
+    def index(self):
+        """paper id -> dense index"""
+        if self._index is None:
+            self._index = {pid: i for i, pid in enumerate(self.ids.tolist())}
+        return self._index
+
+    def successors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def predecessors(self, i):
+        return self.rindices[self.rindptr[i]:self.rindptr[i + 1]]
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.diff(self.rindptr)
+
+    def edges(self):
+        """(src, dst) arrays of dense indices."""
+        src = np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr))
+        return src, np.asarray(self.indices)
+
+    def to_dict(self, values):
+        """{paper id: value} of an array indexed like ids."""
+        return dict(zip(self.ids.tolist(), np.asarray(values).tolist()))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, name + '.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, directed=True):
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in ARRAYS}
+        return cls(directed=directed, **arrays)
+
+    def to_networkx(self, node_attrs=None):
+        """networkx (Di)Graph with the string ids; node_attrs: optional {id: {attr: value}}."""
+        import networkx as nx
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        ids = self.ids.tolist()
+        G.add_nodes_from(ids)
+        src, dst = self.edges()
+        G.add_edges_from(zip([ids[i] for i in src.tolist()], [ids[j] for j in dst.tolist()]))
+        if node_attrs:
+            for node, attrs in node_attrs.items():
+                if node in G:
+                    G.nodes[node].update(attrs)
+        return G
+
+
+def _load_cached(path, pad, directed, cache_dir):
+    name = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.join(cache_dir, name)
+    meta_path = os.path.join(directory, 'meta.json')
+    st = os.stat(path)
+    source = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'pad': pad, 'directed': directed}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            if json.load(f) == source:
+                return CSRGraph.load(directory, directed)
+
+    graph = CSRGraph.from_edges(read_edge_list(path), pad=pad, directed=directed)
+    graph.save(directory)
+    with open(meta_path, 'w') as f:
+        json.dump(source, f)
+    return CSRGraph.load(directory, directed)
+
+
+def load_citation_graph(path='assets/Cit-HepTh.txt', cache_dir=CACHE_DIR):
+    """Directed citation graph (citing -> cited), paper ids zero-padded to 7 digits."""
+    return _load_cached(path, pad=7, directed=True, cache_dir=cache_dir)
+
+
+def load_coauthor_graph(path='assets/CA-HepTh.txt', cache_dir=CACHE_DIR):
+    """Undirected collaboration graph of CA-HepTh (author ids as they are)."""
+    return _load_cached(path, pad=0, directed=False, cache_dir=cache_dir)
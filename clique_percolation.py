@@ -0,0 +1,199 @@
+import time
+import warnings
+from collections import defaultdict
+from itertools import combinations
+from multiprocessing import Pool
+import numpy as np
+from communities import weight_matrix, neighbour_matrix
+
+"""
+Clique percolation (k-clique communities) for large graphs such as the coauthor graph.
+
+Same communities as networkx's k_clique_communities(G, k): the union of the maximal cliques of
+at least k nodes that are chained by overlaps of at least k - 1 nodes. But
+
+  - the maximal cliques are enumerated from a degeneracy ordering (Eppstein, Löffler, Strash):
+    each node only looks for the cliques in which it is the first node of the ordering, among
+    its later neighbours, with Bron-Kerbosch and pivoting. Nodes outside the (k-1)-core are
+    dropped first since they cannot be in a k-clique.
+  - the nodes are cut into chunks of the ordering, shared by a process pool.
+  - there is no clique graph: every clique is joined in a union-find to the other cliques with
+    one of its (k-1)-subsets. The cliques with more than max_clique_size nodes (where the subsets
+    explode) are joined by counting their shared nodes instead, which gives the same result.
+  - time_limit stops the enumeration after that many seconds (the result is then a partial one).
+
+    communities = k_clique_communities(A_Ghep, 3, ids=authors, workers=8)   # list of frozensets
+"""
+
+# 每个进程的图
+# the graph of each worker process
+_worker = {}
+
+
+def degeneracy_order(indptr, indices):
+    """Nodes in degeneracy order (repeatedly remove a node of minimum degree) and their core numbers."""
+    n = len(indptr) - 1
+    degree = np.diff(indptr).tolist()
+    buckets = defaultdict(set)
+    for v, d in enumerate(degree):
+        buckets[d].add(v)
+    removed = [False] * n
+    core = [0] * n
+    order = []
+    current = 0
+    d = 0
+    for _ in range(n):
+        d = max(d - 1, 0)
+        while not buckets[d]:
+            d += 1
+        v = buckets[d].pop()
+        current = max(current, d)
+        core[v] = current
+        removed[v] = True
+        order.append(v)
+        for w in indices[indptr[v]:indptr[v + 1]].tolist():
+            if not removed[w]:
+                buckets[degree[w]].discard(w)
+                degree[w] -= 1
+                buckets[degree[w]].add(w)
+    return order, core
+
+
+def _init_worker(indptr, indices, rank, k, deadline):
+    keep = rank >= 0
+    _worker["adj"] = [set(w for w in indices[indptr[v]:indptr[v + 1]].tolist() if keep[w]) if keep[v] else set()
+                      for v in range(len(indptr) - 1)]
+    _worker["rank"] = rank.tolist()
+    _worker["k"] = k
+    _worker["deadline"] = deadline
+
+
+def _bron_kerbosch(adj, R, P, X, k, cliques, deadline):
+    if not P:
+        if not X and len(R) >= k:
+            cliques.append(tuple(sorted(R)))
+        return True
+    if len(R) + len(P) < k:
+        return True  # no clique of k nodes can grow from here
+    if deadline is not None and time.time() > deadline:
+        return False
+    pivot = max(P | X, key=lambda u: len(P & adj[u]))
+    for v in list(P - adj[pivot]):
+        if not _bron_kerbosch(adj, R + [v], P & adj[v], X & adj[v], k, cliques, deadline):
+            return False
+        P.remove(v)
+        X.add(v)
+    return True
+
+
+def _cliques_of_chunk(nodes):
+    """The maximal cliques (of at least k nodes) whose first node in the ordering is in nodes."""
+    adj, rank, k, deadline = _worker["adj"], _worker["rank"], _worker["k"], _worker["deadline"]
+    cliques = []
+    complete = True
+    for v in nodes:
+        later = {w for w in adj[v] if rank[w] > rank[v]}
+        earlier = adj[v] - later
+        if not _bron_kerbosch(adj, [v], later, earlier, k, cliques, deadline):
+            complete = False
+            break
+    return cliques, complete
+
+
+def maximal_cliques(indptr, indices, k=2, workers=1, n_chunks=None, time_limit=None):
+    """
+    Maximal cliques of at least k nodes of a symmetric CSR adjacency (no self-loops), as sorted
+    tuples of node indices. Returns (cliques, complete); complete is False if time_limit was hit.
+    """
+    order, core = degeneracy_order(indptr, indices)
+    core = np.asarray(core)
+    rank = np.full(len(core), -1, dtype=np.int64)
+    order = [v for v in order if core[v] >= k - 1]
+    rank[order] = np.arange(len(order))
+    deadline = None if time_limit is None else time.time() + time_limit
+
+    # the first nodes of the ordering have the most later neighbours: deal them out round-robin
+    n_chunks = n_chunks or max(1, 4 * workers)
+    chunks = [order[i::n_chunks] for i in range(n_chunks)]
+    initargs = (np.asarray(indptr), np.asarray(indices), rank, k, deadline)
+    if workers == 1:
+        _init_worker(*initargs)
+        results = [_cliques_of_chunk(chunk) for chunk in chunks]
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            results = pool.map(_cliques_of_chunk, chunks)
+    cliques = sorted(clique for chunk_cliques, _ in results for clique in chunk_cliques)
+    return cliques, all(complete for _, complete in results)
+
+
+def percolate(cliques, k, max_clique_size=30):
+    """Groups of cliques chained by overlaps of at least k - 1 nodes (union-find), as lists of indices."""
+    parent = list(range(len(cliques)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    big = [i for i, clique in enumerate(cliques) if len(clique) > max_clique_size]
+    big_of = defaultdict(set)  # node -> the big cliques containing it
+    for i in big:
+        for v in cliques[i]:
+            big_of[v].add(i)
+
+    owner = {}
+    for i, clique in enumerate(cliques):
+        if len(clique) > max_clique_size:
+            continue
+        for subset in combinations(clique, k - 1):
+            j = owner.setdefault(subset, i)
+            if j != i:
+                union(i, j)
+            # a (k-1)-subset inside a big clique
+            if subset[0] in big_of:
+                for b in set.intersection(*(big_of.get(v, set()) for v in subset)):
+                    union(i, b)
+
+    # big cliques with each other: count the shared nodes
+    for i in big:
+        shared = defaultdict(int)
+        for v in cliques[i]:
+            for b in big_of[v]:
+                if b > i:
+                    shared[b] += 1
+        for b, count in shared.items():
+            if count >= k - 1:
+                union(i, b)
+
+    groups = defaultdict(list)
+    for i in range(len(cliques)):
+        groups[find(i)].append(i)
+    return list(groups.values())
+
+
+def k_clique_communities(graph, k, ids=None, workers=1, max_clique_size=30, time_limit=None):
+    """
+    k-clique communities of a CSRGraph or a scipy sparse adjacency (directions are ignored), as a
+    list of frozensets of nodes (ids[node] if ids is given, graph.ids for a CSRGraph), the largest first.
+    """
+    if k < 2:
+        raise ValueError("k must be at least 2")
+    W = neighbour_matrix(weight_matrix(graph))
+    if ids is None and hasattr(graph, "ids"):
+        ids = graph.ids
+    cliques, complete = maximal_cliques(W.indptr, W.indices, k, workers, time_limit=time_limit)
+    if not complete:
+        warnings.warn(f"time limit of {time_limit}s reached, the communities are built from the cliques found so far")
+
+    communities = []
+    for group in percolate(cliques, k, max_clique_size):
+        nodes = np.unique(np.concatenate([cliques[i] for i in group]))
+        communities.append(frozenset((nodes if ids is None else np.asarray(ids)[nodes]).tolist()))
+    communities.sort(key=lambda c: -len(c))
+    return communities
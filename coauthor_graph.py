@@ -0,0 +1,116 @@
+import numpy as np
+import scipy.sparse as sp
+
+"""
+Coauthorship graph as sparse matrices.
+
+    B  papers x authors incidence (1 if the author signed the paper)
+    A  = B^T B without the diagonal: A[i, j] = number of papers written together by authors i and j
+
+The authors are sorted by name, so row i of A is authors[i]. The papers of an author are the
+nonzeros of a column of B, and the number of collaborators (the degree in the graph) is the
+number of nonzeros of a row of A.
+
+    coauthors = CoauthorGraph.from_papers(papers.values())     # papers of temp/papers_standardized.json
+    coauthors.adjacency                                        # scipy CSR, for communities.py
+    coauthors.papers_of("Edward Witten")                       # titles
+    coauthors.write_authors_list("temp/authors_list.csv")
+"""
+
+
+class CoauthorGraph:
+    def __init__(self, authors, paper_ids, titles, incidence, first_author):
+        self.authors = list(authors)
+        self.paper_ids = list(paper_ids)
+        self.titles = list(titles)
+        self.incidence = incidence.tocsr()
+        self.first_author = np.asarray(first_author, dtype=np.int64)  # -1: paper without authors
+        self._by_author = self.incidence.T.tocsr()
+        self.adjacency = (self._by_author @ self.incidence).tocsr()
+        self.adjacency.setdiag(0)
+        self.adjacency.eliminate_zeros()
+        self.index = {author: i for i, author in enumerate(self.authors)}
+
+    @classmethod
+    def from_papers(cls, papers):
+        """papers: dicts with "paper_id", "title" and "authors" (a list of names)."""
+        paper_ids, titles, rows, names, first = [], [], [], [], []
+        for paper in papers:
+            row = len(paper_ids)
+            paper_ids.append(paper.get("paper_id"))
+            titles.append(paper.get("title"))
+            first.append(len(names) if paper["authors"] else -1)
+            for author in paper["authors"]:
+                rows.append(row)
+                names.append(author)
+
+        authors = sorted(set(names))
+        index = {author: i for i, author in enumerate(authors)}
+        cols = [index[name] for name in names]
+        first_author = [cols[k] if k >= 0 else -1 for k in first]
+        B = sp.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)),
+                          shape=(len(paper_ids), len(authors)))
+        B.sum_duplicates()
+        B.data[:] = 1.0  # an author listed twice on a paper counts once
+        return cls(authors, paper_ids, titles, B, first_author)
+
+    @property
+    def n_authors(self):
+        return len(self.authors)
+
+    @property
+    def n_edges(self):
+        return self.adjacency.nnz // 2
+
+    def degree(self):
+        """Number of distinct collaborators of every author."""
+        return np.diff(self.adjacency.indptr)
+
+    def paper_counts(self):
+        return np.diff(self._by_author.indptr)
+
+    def paper_rows(self, author):
+        """Row numbers (in B) of the papers of an author, in the order of the papers."""
+        i = self.index[author]
+        return self._by_author.indices[self._by_author.indptr[i]:self._by_author.indptr[i + 1]]
+
+    def attribution(self, mode="first"):
+        """
+        papers x authors matrix saying which authors a paper counts for:
+            "first"       1 for the first author only
+            "all"         1 for every author
+            "fractional"  1 / number of authors for every author (each paper counts once in total)
+        """
+        if mode == "all":
+            return self.incidence
+        if mode == "fractional":
+            n_authors = np.diff(self.incidence.indptr)
+            return (sp.diags(1.0 / np.maximum(n_authors, 1)) @ self.incidence).tocsr()
+        if mode == "first":
+            has = self.first_author >= 0
+            return sp.csr_matrix((np.ones(int(has.sum())), (np.flatnonzero(has), self.first_author[has])),
+                                 shape=self.incidence.shape)
+        raise ValueError(f"unknown attribution mode {mode!r}, expected 'first', 'all' or 'fractional'")
+
+    def papers_of(self, author):
+        return [self.titles[row] for row in self.paper_rows(author).tolist()]
+
+    def write_authors_list(self, path):
+        """Every author (alphabetical order) with the number of collaborators."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Author,Number of collaborations\n")
+            for author, degree in zip(self.authors, self.degree().tolist()):
+                f.write(f"{author},{degree}\n")
+
+    def to_networkx(self):
+        """nx.Graph with the titles of the papers of each author and the number of joint papers as weight."""
+        import networkx as nx
+        G = nx.Graph()
+        for i, author in enumerate(self.authors):
+            start, end = self._by_author.indptr[i], self._by_author.indptr[i + 1]
+            G.add_node(author, papers=[self.titles[row] for row in self._by_author.indices[start:end].tolist()])
+        upper = sp.triu(self.adjacency, k=1).tocoo()
+        G.add_weighted_edges_from(zip([self.authors[i] for i in upper.row.tolist()],
+                                      [self.authors[j] for j in upper.col.tolist()],
+                                      upper.data.tolist()))
+        return G
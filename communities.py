@@ -0,0 +1,267 @@
+import numpy as np
+import scipy.sparse as sp
+
+"""
+Community detection on sparse adjacency arrays: Louvain, label propagation and resolution sweeps.
+
+The graph is either a CSRGraph of citation_graph.py or a scipy sparse (weighted) adjacency matrix,
+and the communities are returned as an int array labels[node] numbered 0..c-1 by decreasing size
+(communities_of turns it back into the list of sets networkx returns).
+
+Internally every graph is a directed weight matrix A with m = A.sum(); an undirected graph is
+stored as A = S / 2 off the diagonal (self-loops kept whole), so that the directed modularity
+
+    Q = sum_c  A_in(c) / m - resolution * out(c) * in(c) / m^2
+
+is also the undirected one. This is the modularity (and move gain) of networkx's louvain_communities.
+
+Louvain local moves are vectorised: the nodes are visited in random order in a few batches; for all
+the nodes of a batch, the weights to the neighbouring communities are summed with one sort, the
+best gain of every node is taken at once and the nodes with a positive gain move together. A single
+node only joins another single node of smaller label, so that two singletons do not swap. The
+communities are then aggregated with one sparse product S^T A S, as in the original algorithm.
+
+    labels = louvain(citation_csr, resolution=0.1, seed=123)
+    sweep = louvain_sweep(A, [40, 20, 10, 5, 1], seed=123)     # {resolution: labels}, warm-started
+    labels = label_propagation(A, seed=123)
+"""
+
+BATCHES = 16
+
+
+def weight_matrix(graph, directed=None):
+    """The directed weight matrix A (csr, float64) of a CSRGraph or a scipy sparse adjacency."""
+    if sp.issparse(graph):
+        S = sp.csr_matrix(graph, dtype=np.float64)
+        if directed is None:
+            directed = (S != S.T).nnz > 0
+    else:
+        n = graph.n_nodes
+        S = sp.csr_matrix((np.ones(len(graph.indices)), np.asarray(graph.indices), np.asarray(graph.indptr)),
+                          shape=(n, n))
+        directed = graph.directed if directed is None else directed
+    S.sum_duplicates()
+    if directed:
+        return S
+    A = S / 2
+    A.setdiag(S.diagonal())
+    A.eliminate_zeros()
+    return A.tocsr()
+
+
+def neighbour_matrix(A):
+    """W = A + A^T without the diagonal: the weight between two nodes in either direction."""
+    W = (A + A.T).tocsr()
+    W.setdiag(0)
+    W.eliminate_zeros()
+    return W
+
+
+def _expand(W, batch):
+    """(position in batch, neighbour, weight) of the edges of the nodes of batch."""
+    starts = W.indptr[batch]
+    counts = W.indptr[batch + 1] - starts
+    pos = np.repeat(np.arange(len(batch)), counts)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+    return pos, W.indices[offsets], W.data[offsets]
+
+
+def _group(pos, labels, weights, n):
+    """Sum the weights of the same (position, label): returns positions, labels, summed weights."""
+    keys, inverse = np.unique(pos * n + labels, return_inverse=True)
+    return keys // n, keys % n, np.bincount(inverse, weights=weights)
+
+
+def modularity(graph, labels, resolution=1.0, directed=None):
+    """Modularity of labels, same as nx.community.modularity (directed graphs included)."""
+    return _modularity(weight_matrix(graph, directed), np.asarray(labels), resolution)
+
+
+def _modularity(A, labels, resolution):
+    m = A.sum()
+    if m == 0:
+        return 0.0
+    c = labels.max() + 1
+    coo = A.tocoo()
+    inside = labels[coo.row] == labels[coo.col]
+    internal = coo.data[inside].sum()
+    out_c = np.bincount(labels, weights=np.asarray(A.sum(1)).ravel(), minlength=c)
+    in_c = np.bincount(labels, weights=np.asarray(A.sum(0)).ravel(), minlength=c)
+    return internal / m - resolution * np.dot(out_c, in_c) / m ** 2
+
+
+def _local_moves(A, labels, resolution, rng, batches, threshold, max_passes=100):
+    n = A.shape[0]
+    m = A.sum()
+    kout = np.asarray(A.sum(1)).ravel()
+    kin = np.asarray(A.sum(0)).ravel()
+    W = neighbour_matrix(A)
+    labels = labels.copy()
+    out_c = np.bincount(labels, weights=kout, minlength=n)
+    in_c = np.bincount(labels, weights=kin, minlength=n)
+    size = np.bincount(labels, minlength=n)
+    order = rng.permutation(n)
+    mod = _modularity(A, labels, resolution)
+    improvement = False
+
+    for _ in range(max_passes):
+        previous = labels.copy()
+        moves = 0
+        for batch in np.array_split(order, min(batches, n)):
+            pos, nbrs, w = _expand(W, batch)
+            if not len(pos):
+                continue
+            upos, com, wt = _group(pos, labels[nbrs], w, n)
+            own = labels[batch]
+            ko, ki = kout[batch], kin[batch]
+
+            w_own = np.zeros(len(batch))
+            is_own = com == own[upos]
+            w_own[upos[is_own]] = wt[is_own]
+            # gain of leaving the own community, then of joining each neighbouring one
+            remove_cost = -w_own / m + resolution * (ko * (in_c[own] - ki) + ki * (out_c[own] - ko)) / m ** 2
+            gain = remove_cost[upos] + wt / m - resolution * (ko[upos] * in_c[com] + ki[upos] * out_c[com]) / m ** 2
+            gain[is_own] = 0.0
+            # two single nodes do not join each other at the same time
+            swap = (size[own[upos]] == 1) & (size[com] == 1) & (com > own[upos])
+            gain[swap] = 0.0
+
+            best = np.lexsort((-gain, upos))
+            first = np.ones(len(best), dtype=bool)
+            first[1:] = upos[best[1:]] != upos[best[:-1]]
+            best = best[first]
+            best = best[gain[best] > 0]
+            if not len(best):
+                continue
+
+            movers = batch[upos[best]]
+            old, new = labels[movers], com[best]
+            labels[movers] = new
+            np.subtract.at(out_c, old, kout[movers])
+            np.subtract.at(in_c, old, kin[movers])
+            np.subtract.at(size, old, 1)
+            np.add.at(out_c, new, kout[movers])
+            np.add.at(in_c, new, kin[movers])
+            np.add.at(size, new, 1)
+            moves += len(movers)
+
+        if moves == 0:
+            break
+        new_mod = _modularity(A, labels, resolution)
+        # simultaneous moves may overshoot; stop when a pass no longer improves
+        if new_mod < mod:
+            labels = previous
+            break
+        improvement = True
+        if new_mod - mod <= threshold:
+            break
+        mod = new_mod
+    return labels, improvement
+
+
+def _dense(labels):
+    """Labels renumbered 0..c-1 (in order of the old labels)."""
+    return np.unique(labels, return_inverse=True)[1].astype(np.int64)
+
+
+def _by_size(labels):
+    """Labels renumbered 0..c-1 by decreasing community size (ties: smallest node first)."""
+    labels = _dense(labels)
+    c = labels.max() + 1 if len(labels) else 0
+    size = np.bincount(labels, minlength=c)
+    first = np.full(c, len(labels))
+    np.minimum.at(first, labels, np.arange(len(labels)))
+    rank = np.empty(c, dtype=np.int64)
+    rank[np.lexsort((first, -size))] = np.arange(c)
+    return rank[labels]
+
+
+def louvain(graph, resolution=1.0, seed=None, threshold=1e-7, init=None, directed=None, batches=BATCHES):
+    """
+    Louvain communities of graph as an int array (see louvain_communities of networkx for
+    resolution and threshold). init: labels to start from instead of one community per node.
+    """
+    A = weight_matrix(graph, directed)
+    return _louvain(A, resolution, np.random.default_rng(seed), threshold, init, batches)
+
+
+def _louvain(A, resolution, rng, threshold, init, batches):
+    n = A.shape[0]
+    if n == 0 or A.sum() == 0:
+        return np.arange(n)
+
+    base = np.arange(n)
+    level_labels = base.copy() if init is None else _dense(np.asarray(init))
+    mod = _modularity(A, level_labels, resolution)
+    while True:
+        local, improvement = _local_moves(A, level_labels, resolution, rng, batches, threshold)
+        local = _dense(local)
+        base = local[base]
+        new_mod = _modularity(A, local, resolution)
+        if not improvement or new_mod - mod <= threshold:
+            break
+        mod = new_mod
+        # aggregate: one node per community
+        c = local.max() + 1
+        S = sp.csr_matrix((np.ones(len(local)), (np.arange(len(local)), local)), shape=(len(local), c))
+        A = (S.T @ A @ S).tocsr()
+        level_labels = np.arange(c)
+    return _by_size(base)
+
+
+def louvain_sweep(graph, resolutions, seed=None, threshold=1e-7, directed=None, batches=BATCHES):
+    """
+    {resolution: labels} for several resolutions. The resolutions are run from the largest to the
+    smallest, each run starting from the communities of the previous (larger) one: Louvain only
+    merges, so a finer partition is a good start for a coarser one and the later runs are short.
+    """
+    A = weight_matrix(graph, directed)
+    rng = np.random.default_rng(seed)
+    results = {}
+    labels = None
+    for resolution in sorted(set(resolutions), reverse=True):
+        labels = _louvain(A, resolution, rng, threshold, labels, batches)
+        results[resolution] = labels
+    return {resolution: results[resolution] for resolution in resolutions}
+
+
+def label_propagation(graph, seed=None, max_iter=100, directed=None, batches=BATCHES):
+    """
+    Label propagation communities as an int array: each node takes the label with the largest
+    weight among its neighbours (keeping its own label on a tie), batch by batch in random order,
+    until no label changes. Directed graphs are treated as undirected, as in networkx.
+    """
+    A = weight_matrix(graph, directed)
+    W = neighbour_matrix(A)
+    n = W.shape[0]
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n)
+    order = rng.permutation(n)
+    for _ in range(max_iter):
+        changed = 0
+        for batch in np.array_split(order, min(batches, max(n, 1))):
+            pos, nbrs, w = _expand(W, batch)
+            if not len(pos):
+                continue
+            upos, lab, wt = _group(pos, labels[nbrs], w, n)
+            own = labels[batch][upos] == lab
+            # heaviest label first, the own label first among the heaviest, then at random
+            best = np.lexsort((rng.random(len(upos)), ~own, -wt, upos))
+            first = np.ones(len(best), dtype=bool)
+            first[1:] = upos[best[1:]] != upos[best[:-1]]
+            best = best[first]
+            best = best[~own[best]]
+            labels[batch[upos[best]]] = lab[best]
+            changed += len(best)
+        if changed == 0:
+            break
+    return _by_size(labels)
+
+
+def communities_of(labels, ids=None):
+    """List of sets of nodes (ids[node] when ids is given), community 0 first."""
+    labels = np.asarray(labels)
+    nodes = np.arange(len(labels)) if ids is None else np.asarray(ids)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    return [set(group.tolist()) for group in np.split(nodes[order], bounds)] if len(labels) else []
@@ -1,5 +1,8 @@
 import json
-from nom import extract_author  
+import argparse
+from itertools import tee
+from nom import extract_authors_batch
+from records import iter_records, write_records
 
 """
 This script standardizes author names in scientific papers by mapping variants to a standard name.
@@ -10,49 +13,73 @@ The script does the following:
 1. Loads author variants from a JSON file.
 2. Maps author name variants to their standard names.
 3. Reads the original JSON file containing papers.
-4. Extracts author names using the `extract_author` function from `nom.py`.
+4. Extracts author names using `extract_authors_batch` from `nom.py`.
 5. Standardizes the extracted names using the mapping.
+
+The papers are streamed: they are read one by one (from .json or .jsonl) and written as soon as
+they are standardized, so the memory does not grow with the size of the corpus.
+
+usage:
+    python convert.py                                               # temp/output.json -> temp/papers_standardized.json
+    python convert.py temp/output.jsonl temp/papers_standardized.jsonl
+    python convert.py --db temp/papers.db                           # also load them into the paper store
 """
 
-# 加载变体
-# load author variants from JSON file
-with open('author_variants.json', 'r') as f:
-    author_variants = json.load(f)
-
-# 反向映射：变体 -> 标准名字
-# mapping from variant to standard name
-variant_to_standard = {}
-for standard_name, variants in author_variants.items():
-    for variant in variants:
-        if variant.strip():
-            variant_to_standard[variant.strip()] = standard_name.strip()
-
-def standardize_name(name):
-    name = name.strip()
-    return variant_to_standard.get(name, name)
-
-# 读取原始 JSON（你之前从 .abs 提取的）
-# Read the original JSON file (extracted from .abs files)
-with open('temp/output.json', 'r') as f:
-    papers = json.load(f)
-
-for paper in papers:
-    author_str = paper.get('authors', '')
+
+def load_variant_to_standard(path):
+    # 加载变体
+    # load author variants from JSON file
+    with open(path, 'r') as f:
+        author_variants = json.load(f)
+
+    # 反向映射：变体 -> 标准名字
+    # mapping from variant to standard name
+    variant_to_standard = {}
+    for standard_name, variants in author_variants.items():
+        for variant in variants:
+            if variant.strip():
+                variant_to_standard[variant.strip()] = standard_name.strip()
+    return variant_to_standard
+
+
+def standardize_papers(papers, variant_to_standard):
+    """Yield the papers with standardized authors and cleaned paper_id, one at a time."""
+    papers, papers_for_authors = tee(papers)
     # 用 nom.py 的规则提取名字
     # Extract names using the rules from nom.py
-    author_names = extract_author(author_str)
-    standardized = []
-    for name in author_names:
-        standardized.append(standardize_name(name))
-    paper['authors'] = standardized
-    # 将"paper_id": "hep-th/9211077" 改为"paper_id": "9211077"
-    # Change "paper_id": "hep-th/9211077" to "paper_id": "9211077"
-    if 'paper_id' in paper:
-        paper['paper_id'] = paper['paper_id'].split('/')[-1]
-
-# 保存
-# Save the standardized papers to a new JSON file
-with open('temp/papers_standardized.json', 'w') as f:
-    json.dump(papers, f, indent=2)
-
-print("Standardized author names and saved to temp/papers_standardized.json")
+    all_author_names = extract_authors_batch(paper.get('authors', '') for paper in papers_for_authors)
+    for paper, author_names in zip(papers, all_author_names):
+        standardized = []
+        for name in author_names:
+            name = name.strip()
+            standardized.append(variant_to_standard.get(name, name))
+        paper['authors'] = standardized
+        # 将"paper_id": "hep-th/9211077" 改为"paper_id": "9211077"
+        # Change "paper_id": "hep-th/9211077" to "paper_id": "9211077"
+        if 'paper_id' in paper:
+            paper['paper_id'] = paper['paper_id'].split('/')[-1]
+        yield paper
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="standardize the author names of the papers")
+    parser.add_argument('input', nargs='?', default='temp/output.json')
+    parser.add_argument('output', nargs='?', default='temp/papers_standardized.json')
+    parser.add_argument('--variants', default='temp/author_variants.json')
+    parser.add_argument('--db', help="also load the standardized papers into this SQLite store (paper_store.py)")
+    args = parser.parse_args()
+
+    variant_to_standard = load_variant_to_standard(args.variants)
+
+    # 读取原始 JSON（你之前从 .abs 提取的），逐条处理并保存
+    # Read the original papers (extracted from .abs files) one by one, standardize and save them
+    papers = iter_records(args.input)
+    n = write_records(args.output, standardize_papers(papers, variant_to_standard), ensure_ascii=True)
+
+    print(f"Standardized author names of {n} papers and saved to {args.output}")
+
+    if args.db:
+        from paper_store import PaperStore
+        with PaperStore(args.db) as store:
+            store.add_papers(iter_records(args.output))
+        print(f"Loaded them into {args.db}")
@@ -0,0 +1,139 @@
+import os
+import json
+import fcntl
+import hashlib
+import numpy as np
+
+"""
+On-disk embedding store shared by mot.py and merge-keywords.py.
+
+Every text is addressed by sha1(model name + text). The vectors are appended to a raw float32
+file which is read back as a memory map, and the 20-byte keys are appended in the same order to
+a second file, so the row of a vector is the position of its key:
+
+    temp/embedding_cache/all-MiniLM-L6-v2/
+        meta.json      {"model": ..., "dim": ...}
+        keys.bin       n x 20 bytes
+        vectors.f32    n x dim float32
+
+Only the texts never seen before are given to the model:
+
+    cache = EmbeddingCache("all-MiniLM-L6-v2")
+    model = SentenceTransformer("all-MiniLM-L6-v2") if cache.missing(texts) else None
+    embeddings = cache.encode(texts, model, show_progress_bar=True)
+
+Appends take an exclusive lock, so several worker processes can share one cache.
+"""
+
+KEY_SIZE = 20
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, path=None):
+        self.model_name = model_name
+        self.path = path or os.path.join('temp', 'embedding_cache', model_name.replace('/', '_'))
+        os.makedirs(self.path, exist_ok=True)
+        self.meta_path = os.path.join(self.path, 'meta.json')
+        self.keys_path = os.path.join(self.path, 'keys.bin')
+        self.vectors_path = os.path.join(self.path, 'vectors.f32')
+        self.lock_path = os.path.join(self.path, 'lock')
+
+        self.dim = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                self.dim = json.load(f)['dim']
+        self.row = {}
+        self._load()
+
+    def _load(self):
+        n = 0
+        if self.dim is not None and os.path.exists(self.keys_path):
+            n_keys = os.path.getsize(self.keys_path) // KEY_SIZE
+            n_vectors = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            n = min(n_keys, n_vectors)  # an interrupted append leaves a few extra bytes
+            # raw bytes: a dtype 'S20' would strip the trailing NULs of a digest ending in \x00
+            data = np.fromfile(self.keys_path, dtype=np.uint8, count=n * KEY_SIZE).tobytes()
+            self.row = {data[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(n)}
+        self._map(n)
+
+    def _map(self, n):
+        if n == 0:
+            self.vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        else:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(n, self.dim))
+
+    def _refresh(self):
+        # reload if another process has appended since
+        if self.dim is not None and os.path.exists(self.keys_path):
+            if os.path.getsize(self.keys_path) // KEY_SIZE > len(self.vectors):
+                self._load()
+
+    def key(self, text):
+        return hashlib.sha1((self.model_name + '\0' + text).encode('utf-8')).digest()
+
+    def __len__(self):
+        return len(self.row)
+
+    def __contains__(self, text):
+        return self.key(text) in self.row
+
+    def missing(self, texts):
+        """The distinct texts that are not in the cache yet, in order of first appearance."""
+        self._refresh()
+        todo = {}
+        for text in texts:
+            k = self.key(text)
+            if k not in self.row and k not in todo:
+                todo[k] = text
+        return list(todo.values())
+
+    def encode(self, texts, model=None, **encode_kwargs):
+        """
+        Embeddings of texts as a (len(texts), dim) float32 array, in the order of texts.
+        The missing texts are encoded with model.encode(..., **encode_kwargs) and added to the cache.
+        """
+        self._refresh()
+        keys = [self.key(text) for text in texts]
+        todo = {}
+        for k, text in zip(keys, texts):
+            if k not in self.row and k not in todo:
+                todo[k] = text
+        if todo:
+            if model is None:
+                raise ValueError(f"{len(todo)} texts are not in the cache and no model was given")
+            vectors = np.asarray(model.encode(list(todo.values()), **encode_kwargs), dtype=np.float32)
+            self._append(list(todo.keys()), vectors)
+
+        rows = np.fromiter((self.row[k] for k in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self.vectors[rows]) if len(rows) else np.zeros((0, self.dim or 0), np.float32)
+
+    def _append(self, keys, vectors):
+        with open(self.lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, 'w') as f:
+                    json.dump({'model': self.model_name, 'dim': self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"the cache stores vectors of size {self.dim}, got {vectors.shape[1]}")
+
+            # other processes may have appended since our last read: reload first, and write only
+            # the keys they have not written meanwhile
+            n = 0
+            if os.path.exists(self.keys_path) and os.path.exists(self.vectors_path):
+                n = min(os.path.getsize(self.keys_path) // KEY_SIZE,
+                        os.path.getsize(self.vectors_path) // (4 * self.dim))
+            if n != len(self.vectors):
+                self._load()
+            new = [i for i, k in enumerate(keys) if k not in self.row]
+            keys, vectors = [keys[i] for i in new], vectors[new]
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(n * 4 * self.dim)
+                f.write(np.ascontiguousarray(vectors).tobytes())
+            with open(self.keys_path, 'ab') as f:
+                f.truncate(n * KEY_SIZE)
+                f.write(b''.join(keys))
+
+            for i, k in enumerate(keys):
+                self.row[k] = n + i
+            self._map(n + len(keys))
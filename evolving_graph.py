@@ -0,0 +1,184 @@
+import argparse
+from itertools import combinations
+import numpy as np
+from paper_dates import month_label
+
+"""
+The citation and coauthor graphs replayed in submission order, with their statistics kept up to
+date as the papers and edges arrive, instead of rebuilding the graphs for every time window.
+
+A paper (or an author, with their first paper) appears at its submission month (paper_dates.py);
+a citation appears when both papers exist, a collaboration with the first joint paper. Every new
+edge updates the degrees and a union-find of the connected components; with community labels
+(e.g. from communities.py) the number of members present in every community is counted too.
+A window only touches its new nodes and edges.
+
+    months = month_index(citation_csr.ids)
+    snapshots = replay(*citation_events(citation_csr, months), step=12)            # one per year
+    snapshots = replay(*coauthor_events(coauthors, paper_months), step=1, labels=lc_labels)
+    pd.DataFrame(snapshots)
+"""
+
+
+class EvolvingGraph:
+    def __init__(self, n, labels=None):
+        self.active = np.zeros(n, dtype=bool)
+        self.degree = np.zeros(n, dtype=np.int64)
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.n_nodes = 0
+        self.n_edges = 0
+        self.n_components = 0
+        self.largest_component = 0
+        self.max_degree = 0
+        self.labels = None if labels is None else np.asarray(labels)
+        if self.labels is not None:
+            self.members = np.zeros(int(self.labels.max()) + 1, dtype=np.int64)
+            self.n_communities = 0
+            self.n_members = 0
+            self.largest_community = 0
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    def add_nodes(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        nodes = nodes[~self.active[nodes]]
+        self.active[nodes] = True
+        self.n_nodes += len(nodes)
+        self.n_components += len(nodes)
+        if len(nodes):
+            self.largest_component = max(self.largest_component, 1)
+        if self.labels is not None:
+            labels = self.labels[nodes]
+            labels = labels[labels >= 0]
+            self.n_communities += len(np.unique(labels[self.members[labels] == 0]))
+            np.add.at(self.members, labels, 1)
+            self.n_members += len(labels)
+            if len(labels):
+                self.largest_community = max(self.largest_community, int(self.members[labels].max()))
+
+    def add_edges(self, src, dst):
+        """New edges (each given once); their nodes are added if needed."""
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        self.add_nodes(np.concatenate([src, dst]))
+        np.add.at(self.degree, src, 1)
+        np.add.at(self.degree, dst, 1)
+        self.n_edges += len(src)
+        if len(src):
+            self.max_degree = max(self.max_degree, int(self.degree[src].max()), int(self.degree[dst].max()))
+        for u, v in zip(src.tolist(), dst.tolist()):
+            root_u, root_v = self.find(u), self.find(v)
+            if root_u == root_v:
+                continue
+            if self.size[root_u] < self.size[root_v]:
+                root_u, root_v = root_v, root_u
+            self.parent[root_v] = root_u
+            self.size[root_u] += self.size[root_v]
+            self.n_components -= 1
+            if self.size[root_u] > self.largest_component:
+                self.largest_component = self.size[root_u]
+
+    def stats(self):
+        """The statistics of the graph so far (counters only: nothing is recomputed)."""
+        stats = {
+            "nodes": self.n_nodes,
+            "edges": self.n_edges,
+            "mean_degree": 2 * self.n_edges / self.n_nodes if self.n_nodes else 0.0,
+            "max_degree": self.max_degree,
+            "components": self.n_components,
+            "largest_component": self.largest_component,
+        }
+        if self.labels is not None:
+            stats["communities"] = self.n_communities
+            stats["largest_community"] = self.largest_community
+            stats["mean_community_size"] = self.n_members / self.n_communities if self.n_communities else 0.0
+        return stats
+
+
+def replay(node_months, src, dst, edge_months, step=12, labels=None):
+    """
+    Statistics at the end of every window of step months (12: years ending in December, 1: months),
+    as a list of dicts with a "month" key. Nodes and edges without a month (-1) are left out.
+    """
+    node_months, edge_months = np.asarray(node_months), np.asarray(edge_months)
+    node_order = np.argsort(node_months, kind='stable')
+    node_order = node_order[node_months[node_order] >= 0]
+    edge_order = np.argsort(edge_months, kind='stable')
+    edge_order = edge_order[edge_months[edge_order] >= 0]
+    sorted_node_months = node_months[node_order]
+    sorted_edge_months = edge_months[edge_order]
+    if not len(node_order):
+        return []
+
+    first, last = int(sorted_node_months[0]), int(sorted_node_months[-1])
+    start = first + (step - 1 - first % step) if step == 12 else first
+    graph = EvolvingGraph(len(node_months), labels)
+    snapshots = []
+    node_done = edge_done = 0
+    for cutoff in range(start, last + step, step):
+        node_end = np.searchsorted(sorted_node_months, cutoff, side='right')
+        edge_end = np.searchsorted(sorted_edge_months, cutoff, side='right')
+        graph.add_nodes(node_order[node_done:node_end])
+        new_edges = edge_order[edge_done:edge_end]
+        graph.add_edges(src[new_edges], dst[new_edges])
+        node_done, edge_done = node_end, edge_end
+        snapshots.append({"month": month_label(min(cutoff, last)), **graph.stats()})
+    return snapshots
+
+
+def citation_events(graph, months):
+    """(node_months, src, dst, edge_months) of a CSRGraph: a citation arrives with the later of its two papers."""
+    months = np.asarray(months, dtype=np.int64)
+    src, dst = graph.edges()
+    src, dst = src.astype(np.int64), np.asarray(dst, dtype=np.int64)
+    edge_months = np.maximum(months[src], months[dst])
+    edge_months[(months[src] < 0) | (months[dst] < 0)] = -1
+    return months, src, dst, edge_months
+
+
+def coauthor_events(coauthors, paper_months):
+    """
+    (node_months, src, dst, edge_months) of a CoauthorGraph: an author arrives with their first paper,
+    a pair of authors with their first joint paper. paper_months: month of each paper of coauthors.
+    """
+    paper_months = np.asarray(paper_months, dtype=np.int64)
+    B = coauthors.incidence
+    n = coauthors.n_authors
+    first_month = {}
+    for row in np.argsort(paper_months, kind='stable').tolist():
+        month = int(paper_months[row])
+        if month < 0:
+            continue
+        for pair in combinations(B.indices[B.indptr[row]:B.indptr[row + 1]].tolist(), 2):
+            first_month.setdefault(pair, month)
+
+    # an author arrives with their first dated paper
+    node_months = np.full(n, np.iinfo(np.int64).max)
+    rows = np.repeat(np.arange(B.shape[0]), np.diff(B.indptr))
+    dated = paper_months[rows] >= 0
+    np.minimum.at(node_months, B.indices[dated], paper_months[rows[dated]])
+    node_months[node_months == np.iinfo(np.int64).max] = -1
+
+    pairs = np.array(list(first_month.keys()), dtype=np.int64).reshape(-1, 2)
+    edge_months = np.array(list(first_month.values()), dtype=np.int64)
+    return node_months, pairs[:, 0], pairs[:, 1], edge_months
+
+
+if __name__ == '__main__':
+    from citation_graph import load_citation_graph
+    from paper_dates import month_index
+
+    parser = argparse.ArgumentParser(description="Growth of the citation graph, month by month or year by year")
+    parser.add_argument("--citations", default="assets/Cit-HepTh.txt")
+    parser.add_argument("--step", type=int, default=12, help="months per snapshot (12: yearly)")
+    args = parser.parse_args()
+
+    graph = load_citation_graph(args.citations)
+    for snapshot in replay(*citation_events(graph, month_index(graph.ids)), step=args.step):
+        print(", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                        for key, value in snapshot.items()))
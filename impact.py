@@ -0,0 +1,145 @@
+import argparse
+import numpy as np
+import scipy.sparse as sp
+from paper_dates import month_label
+
+"""
+Impact rankings of the papers of the citation graph: PageRank, personalized PageRank and HITS,
+by power iteration with sparse matrix-vector products on the CSR arrays of citation_graph.py.
+
+pagerank follows nx.pagerank (dangling papers spread their score like the teleportation, the
+iteration stops when the l1 change is below n * tol), so the scores are those of networkx up to tol.
+
+Snapshots rank the graph as it was at the end of each period: only the papers submitted by then
+(see paper_dates.py) and the citations between them. Each snapshot starts from the scores of
+the previous one, which is already close, so it needs only a few iterations.
+
+    pr = pagerank(citation_csr)                                      # array, dense indices
+    ppr = personalized_pagerank(citation_csr, top10_ids)
+    hubs, authorities = hits(citation_csr)
+    yearly = pagerank_snapshots(citation_csr, months, step=12)       # {"1992-12": array, ...}
+    nx.set_node_attributes(G, citation_csr.to_dict(pr), "pagerank")
+"""
+
+
+def _transition(graph, active=None):
+    """
+    Column-stochastic form of the citations, as R (rows: cited, columns: citing) and the out-degrees:
+    a score vector x moves to R @ (x / out_degree). active: mask of the papers kept.
+    """
+    src, dst = graph.edges()
+    n = graph.n_nodes
+    if active is not None:
+        keep = active[src] & active[dst]
+        src, dst = src[keep], dst[keep]
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    R = sp.csr_matrix((np.ones(len(src)), (dst, src)), shape=(n, n))
+    return R, out_degree
+
+
+def _pagerank(R, out_degree, active, alpha, p, tol, max_iter, x0):
+    n_active = int(active.sum())
+    dangling = active & (out_degree == 0)
+    inv_out = np.divide(1.0, out_degree, out=np.zeros_like(out_degree), where=out_degree > 0)
+    x = p.copy() if x0 is None else x0 / x0.sum()
+    for _ in range(max_iter):
+        previous = x
+        x = alpha * (R @ (x * inv_out) + x[dangling].sum() * p) + (1 - alpha) * p
+        if np.abs(x - previous).sum() < n_active * tol:
+            return x
+    raise RuntimeError(f"pagerank did not converge in {max_iter} iterations")
+
+
+def _personalization(graph, active, seeds=None):
+    p = active.astype(np.float64)
+    if seeds is not None:
+        p = np.zeros(graph.n_nodes)
+        rows = [graph.index[s] for s in seeds if s in graph.index]
+        p[rows] = 1.0
+        p *= active
+        if not p.any():
+            raise ValueError("none of the seed papers is in the graph")
+    return p / p.sum()
+
+
+def pagerank(graph, alpha=0.85, tol=1e-6, max_iter=100, x0=None):
+    """PageRank of every paper (array indexed like graph.ids, summing to 1)."""
+    active = np.ones(graph.n_nodes, dtype=bool)
+    R, out_degree = _transition(graph)
+    return _pagerank(R, out_degree, active, alpha, _personalization(graph, active), tol, max_iter, x0)
+
+
+def personalized_pagerank(graph, seeds, alpha=0.85, tol=1e-6, max_iter=100):
+    """PageRank restarting from the seed papers (ids) only: the papers close to them in the citations."""
+    active = np.ones(graph.n_nodes, dtype=bool)
+    R, out_degree = _transition(graph)
+    p = _personalization(graph, active, seeds)
+    return _pagerank(R, out_degree, active, alpha, p, tol, max_iter, None)
+
+
+def hits(graph, tol=1e-8, max_iter=100):
+    """(hubs, authorities), each summing to 1: hubs cite good authorities, authorities are cited by good hubs."""
+    src, dst = graph.edges()
+    n = graph.n_nodes
+    A = sp.csr_matrix((np.ones(len(src)), (src, dst)), shape=(n, n))
+    AT = A.T.tocsr()
+    h = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = h
+        a = AT @ h
+        h = A @ a
+        h /= h.max()
+        if np.abs(h - previous).sum() < tol:
+            break
+    else:
+        raise RuntimeError(f"hits did not converge in {max_iter} iterations")
+    a = AT @ h
+    return h / h.sum(), a / a.sum()
+
+
+def pagerank_snapshots(graph, months, step=12, start=None, end=None, alpha=0.85, tol=1e-6, max_iter=100):
+    """
+    {"YYYY-MM": PageRank at the end of that month} every step months (12: one per year, ending in
+    December), each computed on the papers submitted by then and warm-started from the previous one.
+    The papers not submitted yet (or without a date) have a score of 0.
+    """
+    months = np.asarray(months)
+    dated = months >= 0
+    if end is None:
+        end = int(months[dated].max())
+    if start is None:
+        first = int(months[dated].min())
+        start = first + (step - 1 - first % step) if step == 12 else first
+    snapshots = {}
+    x = None
+    for cutoff in range(start, end + step, step):
+        active = dated & (months <= cutoff)
+        if not active.any():
+            continue
+        R, out_degree = _transition(graph, active)
+        p = _personalization(graph, active)
+        if x is not None:
+            # the new papers start from the uniform score
+            x0 = np.where(active & (x == 0), 1.0 / active.sum(), x) * active
+        else:
+            x0 = None
+        x = _pagerank(R, out_degree, active, alpha, p, tol, max_iter, x0)
+        snapshots[month_label(min(cutoff, end))] = x
+    return snapshots
+
+
+if __name__ == '__main__':
+    from citation_graph import load_citation_graph
+    from paper_dates import month_index
+
+    parser = argparse.ArgumentParser(description="PageRank of the citation graph, overall and year by year")
+    parser.add_argument("--citations", default="assets/Cit-HepTh.txt")
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    graph = load_citation_graph(args.citations)
+    ids = graph.ids
+    pr = pagerank(graph)
+    print("PageRank:", ", ".join(f"{ids[i]} {pr[i]:.5f}" for i in np.argsort(-pr)[:args.top].tolist()))
+    for label, scores in pagerank_snapshots(graph, month_index(ids)).items():
+        print(label, ", ".join(str(ids[i]) for i in np.argsort(-scores)[:args.top].tolist()))
@@ -0,0 +1,279 @@
+import json
+import numpy as np
+from collections import defaultdict
+from tqdm import tqdm
+from sklearn.decomposition import IncrementalPCA
+
+"""
+Building blocks of merge-keywords.py.
+
+The keyword phrases are encoded chunk by chunk (through the embedding cache) into a float16
+memory-mapped .npy file, and the PCA is fitted incrementally over the same chunks, so the peak
+memory is set by chunk_size and not by the number of distinct phrases.
+
+ann_cluster is a second merge engine next to HDBSCAN (see below); it returns labels in the same form.
+KeywordClusters keeps the clusters of the last full run so that new phrases can be assigned online.
+"""
+
+CHUNK_SIZE = 8192
+
+
+def chunk_bounds(n, chunk_size=CHUNK_SIZE, min_size=1):
+    """(start, stop) of the chunks of range(n); a last chunk smaller than min_size is merged into the previous one."""
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    if len(bounds) > 1 and bounds[-1][1] - bounds[-1][0] < min_size:
+        last = bounds.pop()
+        bounds[-1] = (bounds[-1][0], last[1])
+    return bounds
+
+
+def encode_to_memmap(texts, cache, model, path, chunk_size=CHUNK_SIZE, **encode_kwargs):
+    """
+    Encode texts chunk by chunk with cache.encode (see embedding_cache.py) and write the vectors
+    into a float16 .npy memory map at path. Returns the memory map.
+    """
+    embeddings = None
+    for start, stop in tqdm(chunk_bounds(len(texts), chunk_size), desc="Encoding keywords"):
+        vectors = cache.encode(texts[start:stop], model, **encode_kwargs)
+        if embeddings is None:
+            embeddings = np.lib.format.open_memmap(path, mode='w+', dtype=np.float16,
+                                                   shape=(len(texts), vectors.shape[1]))
+        embeddings[start:stop] = vectors
+    embeddings.flush()
+    return embeddings
+
+
+def incremental_pca(embeddings, n_components=50, chunk_size=CHUNK_SIZE):
+    """
+    Fit an IncrementalPCA over the chunks of embeddings (e.g. the float16 memory map) and project them.
+    Returns (pca, reduced embeddings as float32).
+    """
+    bounds = chunk_bounds(len(embeddings), chunk_size, min_size=n_components)
+    pca = IncrementalPCA(n_components=n_components)
+    for start, stop in bounds:
+        pca.partial_fit(np.asarray(embeddings[start:stop], dtype=np.float32))
+
+    reduced = np.empty((len(embeddings), n_components), dtype=np.float32)
+    for start, stop in bounds:
+        reduced[start:stop] = pca.transform(np.asarray(embeddings[start:stop], dtype=np.float32))
+    return pca, reduced
+
+
+# ======== approximate nearest neighbour merging ==========
+# An alternative to HDBSCAN on the whole matrix: the phrases are hashed with random hyperplanes
+# (cosine LSH), the cosine similarity is only computed inside the buckets, the pairs above the
+# threshold are kept and joined with a union-find.
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def lsh_similar_pairs(vectors, threshold=0.9, n_tables=8, n_bits=12, seed=42, block_size=1024):
+    """
+    Pairs (i, j), i < j, of rows whose cosine similarity is >= threshold and which fall in the same
+    bucket in at least one of the n_tables hash tables. Returns an (m, 2) int64 array.
+    """
+    X = normalize_rows(vectors)
+    n, dim = X.shape
+    rng = np.random.default_rng(seed)
+    powers = (1 << np.arange(n_bits)).astype(np.int64)
+    found = []
+    for _ in range(n_tables):
+        planes = rng.standard_normal((dim, n_bits)).astype(np.float32)
+        codes = ((X @ planes) > 0).astype(np.int64) @ powers
+        order = np.argsort(codes, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+        stops = np.r_[starts[1:], n]
+        for start, stop in zip(starts, stops):
+            if stop - start < 2:
+                continue
+            members = order[start:stop]
+            B = X[members]
+            # big buckets are compared by blocks of rows
+            for a in range(0, len(members), block_size):
+                S = B[a:a + block_size] @ B.T
+                i, j = np.nonzero(S >= threshold)
+                i = i + a
+                keep = i < j
+                found.append(np.stack([members[i[keep]], members[j[keep]]], axis=1))
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.concatenate(found)
+    lo = np.minimum(pairs[:, 0], pairs[:, 1])
+    hi = np.maximum(pairs[:, 0], pairs[:, 1])
+    keys = np.unique(lo * n + hi)
+    return np.stack([keys // n, keys % n], axis=1)
+
+
+def union_find_labels(n, pairs, min_cluster_size=2):
+    """
+    Join the pairs with a union-find over range(n).
+    Returns labels like HDBSCAN: one label per group of at least min_cluster_size elements, -1 otherwise.
+    """
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    for i, j in pairs.tolist():
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    roots = np.array([find(x) for x in range(n)], dtype=np.int64)
+    _, group, sizes = np.unique(roots, return_inverse=True, return_counts=True)
+    big = sizes >= min_cluster_size
+    new_label = np.full(len(sizes), -1, dtype=np.int64)
+    new_label[big] = np.arange(big.sum())
+    return new_label[group]
+
+
+def ann_cluster(vectors, threshold=0.9, min_cluster_size=2, **lsh_kwargs):
+    """Labels of the LSH + union-find engine, in the same form as hdbscan's fit_predict."""
+    pairs = lsh_similar_pairs(vectors, threshold=threshold, **lsh_kwargs)
+    return union_find_labels(len(vectors), pairs, min_cluster_size)
+
+
+def cluster_stats(vectors, labels):
+    """Number of clusters, clustered phrases and mean cosine similarity to the cluster centroid."""
+    X = normalize_rows(vectors)
+    clustered = labels >= 0
+    n_clusters = int(labels.max()) + 1 if clustered.any() else 0
+    cohesion = float('nan')
+    if n_clusters:
+        centroids = np.zeros((n_clusters, X.shape[1]), dtype=np.float32)
+        np.add.at(centroids, labels[clustered], X[clustered])
+        centroids = normalize_rows(centroids)
+        cohesion = float(np.mean(np.sum(X[clustered] * centroids[labels[clustered]], axis=1)))
+    return {'clusters': n_clusters, 'clustered': int(clustered.sum()), 'cohesion': cohesion}
+
+
+# ======== incremental assignment ==========
+# After a full clustering the state of the clusters is saved (normalized centroid sums in the PCA
+# space, sizes, representative terms, the PCA itself). New phrases are then projected with the same
+# PCA and attached to the nearest centroid if the cosine similarity is above the bound; the others
+# are merged among themselves with the ann engine and open new clusters. When too many phrases
+# had to open new clusters since the last full run (drift), a full re-clustering is needed.
+
+def clean_keyword(kw):
+    # same preprocessing as merge-keywords.py
+    kw = kw.replace(" - ", "-")
+    kw = kw.replace("title:", "")
+    kw = kw.replace("abstract:", "")
+    return kw.replace("$", "")
+
+
+class KeywordClusters:
+    def __init__(self, phrases, phrase_cluster, reps, sums, sizes, components, mean,
+                 n_full, n_added=0, n_opened=0):
+        self.phrases = list(phrases)
+        self.phrase_cluster = list(phrase_cluster)
+        self.reps = list(reps)
+        self.sums = np.asarray(sums, dtype=np.float32)
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.n_full = n_full        # phrases in the last full clustering
+        self.n_added = n_added      # phrases assigned since then
+        self.n_opened = n_opened    # ... of which opened a new cluster
+        self.rep_of = {p: self.reps[c] for p, c in zip(self.phrases, self.phrase_cluster)}
+
+    @classmethod
+    def from_full_run(cls, keywords, reduced, merge_dict, pca):
+        reps = sorted(set(merge_dict[kw] for kw in keywords))
+        rep_index = {rep: i for i, rep in enumerate(reps)}
+        phrase_cluster = np.array([rep_index[merge_dict[kw]] for kw in keywords], dtype=np.int64)
+        sums = np.zeros((len(reps), reduced.shape[1]), dtype=np.float32)
+        np.add.at(sums, phrase_cluster, normalize_rows(reduced))
+        sizes = np.bincount(phrase_cluster, minlength=len(reps))
+        return cls(keywords, phrase_cluster.tolist(), reps, sums, sizes,
+                   pca.components_, pca.mean_, n_full=len(keywords))
+
+    @classmethod
+    def load(cls, prefix='temp/keyword_state'):
+        with open(prefix + '.json', 'r') as f:
+            meta = json.load(f)
+        arrays = np.load(prefix + '.npz')
+        return cls(meta['phrases'], arrays['phrase_cluster'].tolist(), meta['reps'],
+                   arrays['sums'], arrays['sizes'], arrays['components'], arrays['mean'],
+                   meta['n_full'], meta['n_added'], meta['n_opened'])
+
+    def save(self, prefix='temp/keyword_state'):
+        with open(prefix + '.json', 'w') as f:
+            json.dump({'phrases': self.phrases, 'reps': self.reps, 'n_full': self.n_full,
+                       'n_added': self.n_added, 'n_opened': self.n_opened}, f, ensure_ascii=False)
+        np.savez(prefix + '.npz', phrase_cluster=np.asarray(self.phrase_cluster, dtype=np.int64),
+                 sums=self.sums, sizes=self.sizes, components=self.components, mean=self.mean)
+
+    @property
+    def drift(self):
+        """Share of phrases, relative to the last full clustering, that could not join an existing cluster."""
+        return self.n_opened / max(self.n_full, 1)
+
+    def project(self, embeddings):
+        return (np.asarray(embeddings, dtype=np.float32) - self.mean) @ self.components.T
+
+    def assign(self, phrases, embeddings, threshold=0.9):
+        """
+        Add new phrases (with their full embeddings). Returns {phrase: representative term} for the
+        new phrases and {representative term: new variants} for the clusters that changed.
+        """
+        X = normalize_rows(self.project(embeddings))
+        centroids = normalize_rows(self.sums)
+        best = np.full(len(phrases), -1, dtype=np.int64)
+        if len(centroids):
+            # rows per block so that a block of similarities stays around 16M floats
+            step = max(1, (1 << 24) // len(centroids))
+            for start in range(0, len(phrases), step):
+                sims = X[start:start + step] @ centroids.T
+                top = sims.argmax(axis=1)
+                ok = sims[np.arange(len(top)), top] >= threshold
+                best[start:start + step] = np.where(ok, top, -1)
+
+        # the phrases far from every cluster are grouped among themselves
+        alone = np.flatnonzero(best < 0)
+        if len(alone):
+            labels = ann_cluster(X[alone], threshold=threshold, min_cluster_size=1)
+            groups = defaultdict(list)
+            for i, label in zip(alone.tolist(), labels.tolist()):
+                groups[label].append(i)
+            new_sums = []
+            for members in groups.values():
+                best[members] = len(self.reps)
+                self.reps.append(sorted(phrases[i] for i in members)[0])
+                new_sums.append(np.zeros(X.shape[1], dtype=np.float32))
+            self.sums = np.vstack([self.sums] + new_sums)
+            self.sizes = np.concatenate([self.sizes, np.zeros(len(groups), dtype=np.int64)])
+            self.n_opened += len(alone)
+
+        np.add.at(self.sums, best, X)
+        np.add.at(self.sizes, best, 1)
+        self.n_added += len(phrases)
+
+        assigned, changed = {}, defaultdict(list)
+        for phrase, cluster in zip(phrases, best.tolist()):
+            rep = self.reps[cluster]
+            self.phrases.append(phrase)
+            self.phrase_cluster.append(cluster)
+            self.rep_of[phrase] = rep
+            assigned[phrase] = rep
+            changed[rep].append(phrase)
+        return assigned, changed
+
+
+def update_cluster_file(path, changed):
+    """Merge {representative: new variants} into keyword_clusters.json (clusters of 2+ variants only)."""
+    with open(path, 'r') as f:
+        cluster_dict = json.load(f)
+    for rep, variants in changed.items():
+        merged = set(cluster_dict.get(rep, [rep])) | set(variants)
+        if len(merged) > 1:
+            cluster_dict[rep] = sorted(merged)
+    with open(path, 'w') as f:
+        json.dump(dict(sorted(cluster_dict.items())), f, indent=4, ensure_ascii=False)
@@ -0,0 +1,159 @@
+import json
+import numpy as np
+import scipy.sparse as sp
+
+"""
+Integer-encoded keyword store.
+
+The keywords of temp/keywords_extracted.jsonl are interned once into a vocabulary (string -> id)
+and the papers are stored as a paper x keyword CSR matrix (indptr, indices). The synonym clusters
+of temp/keyword_clusters.json become one array canonical[id] -> id of the cluster name, with the
+same lowercase matching as clean_keywords in keyword.ipynb, so remapping all the keywords of all
+the papers is a single gather canonical[indices].
+
+    temp/keyword_store.npz     indptr, indices, canonical
+    temp/keyword_store.json    vocabulary, paper ids, titles
+
+    store = KeywordStore.build('temp/keywords_extracted.jsonl', 'temp/keyword_clusters.json')
+    store.save()
+    store = KeywordStore.load()
+    X = store.matrix()                       # scipy CSR, papers x canonical keywords, 0/1
+    X = store.matrix_for(list(G.nodes()))    # rows in the order of the graph nodes
+"""
+
+
+class KeywordStore:
+    def __init__(self, vocabulary, paper_ids, titles, indptr, indices, canonical):
+        self.vocabulary = list(vocabulary)
+        self.paper_ids = list(paper_ids)
+        self.titles = list(titles)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.canonical = np.asarray(canonical, dtype=np.int32)
+        self.ids = {kw: i for i, kw in enumerate(self.vocabulary)}
+        # a paper id seen twice keeps its last row, like the dict built by clean_keywords
+        self.row_of = {pid: i for i, pid in enumerate(self.paper_ids)}
+
+    @classmethod
+    def build(cls, extracted_path='temp/keywords_extracted.jsonl', clusters_path='temp/keyword_clusters.json'):
+        ids = {}
+        paper_ids, titles, indptr, indices = [], [], [0], []
+        with open(extracted_path, 'r') as f:
+            for line in f:
+                try:
+                    paper = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                paper_ids.append(paper["paper_id"])
+                titles.append(paper["title"])
+                for kw in paper["keywords"]:
+                    indices.append(ids.setdefault(kw, len(ids)))
+                indptr.append(len(indices))
+
+        with open(clusters_path, 'r') as f:
+            keyword_clusters = json.load(f)
+        # 每个同义词（小写）-> 标准关键词
+        # each synonym (lowercase) -> cluster name
+        synonym_to_cluster = {}
+        for cluster_name, synonyms in keyword_clusters.items():
+            for synonym in synonyms:
+                synonym_to_cluster[synonym.lower()] = ids.setdefault(cluster_name, len(ids))
+
+        vocabulary = list(ids)
+        canonical = np.array([synonym_to_cluster.get(kw.lower(), i) for i, kw in enumerate(vocabulary)],
+                             dtype=np.int32)
+        return cls(vocabulary, paper_ids, titles, indptr, indices, canonical)
+
+    @classmethod
+    def from_papers(cls, papers, synonyms=None):
+        """
+        papers: dicts with "paper_id", "title" and "keywords"; synonyms: {keyword: representative}
+        (exact match, like the merge_dict of merge-keywords.py).
+        """
+        ids = {}
+        paper_ids, titles, indptr, indices = [], [], [0], []
+        for paper in papers:
+            paper_ids.append(paper["paper_id"])
+            titles.append(paper["title"])
+            indices.extend(ids.setdefault(kw, len(ids)) for kw in paper["keywords"])
+            indptr.append(len(indices))
+        synonyms = synonyms or {}
+        for rep in synonyms.values():
+            ids.setdefault(rep, len(ids))
+        vocabulary = list(ids)
+        canonical = np.array([ids[synonyms.get(kw, kw)] for kw in vocabulary], dtype=np.int32)
+        return cls(vocabulary, paper_ids, titles, indptr, indices, canonical)
+
+    @classmethod
+    def load(cls, prefix='temp/keyword_store'):
+        with open(prefix + '.json', 'r') as f:
+            meta = json.load(f)
+        arrays = np.load(prefix + '.npz')
+        return cls(meta['vocabulary'], meta['paper_ids'], meta['titles'],
+                   arrays['indptr'], arrays['indices'], arrays['canonical'])
+
+    def save(self, prefix='temp/keyword_store'):
+        with open(prefix + '.json', 'w') as f:
+            json.dump({'vocabulary': self.vocabulary, 'paper_ids': self.paper_ids, 'titles': self.titles}, f)
+        np.savez(prefix + '.npz', indptr=self.indptr, indices=self.indices, canonical=self.canonical)
+
+    def canonical_indices(self):
+        """The keyword ids of all the papers with the synonyms replaced by their cluster name."""
+        return self.canonical[self.indices]
+
+    def canonical_keywords(self):
+        """Keywords of every row, remapped, deduplicated and sorted (one list per paper, in row order)."""
+        indices = self.canonical_indices()
+        rows = np.repeat(np.arange(len(self.paper_ids)), np.diff(self.indptr))
+        # alphabetical rank of every keyword, so one lexsort orders all the rows at once
+        rank = np.empty(len(self.vocabulary), dtype=np.int64)
+        rank[np.argsort(np.array(self.vocabulary, dtype=str), kind='stable')] = np.arange(len(self.vocabulary))
+        order = np.lexsort((rank[indices], rows))
+        rows, indices = rows[order], indices[order]
+        first = np.r_[True, (rows[1:] != rows[:-1]) | (indices[1:] != indices[:-1])] if len(rows) else rows.astype(bool)
+        rows, indices = rows[first], indices[first]
+        bounds = np.searchsorted(rows, np.arange(len(self.paper_ids) + 1))
+        words = [self.vocabulary[i] for i in indices.tolist()]
+        return [words[bounds[r]:bounds[r + 1]] for r in range(len(self.paper_ids))]
+
+    def matrix(self, canonical=True):
+        """Binary papers x vocabulary CSR matrix (duplicates after remapping count once)."""
+        indices = self.canonical_indices() if canonical else self.indices
+        X = sp.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, self.indptr),
+                          shape=(len(self.paper_ids), len(self.vocabulary)))
+        X.sum_duplicates()
+        X.data[:] = 1.0
+        return X
+
+    def matrix_for(self, paper_ids, canonical=True):
+        """Rows of matrix() in the order of paper_ids; papers without keywords get an empty row."""
+        rows = np.array([self.row_of.get(pid, -1) for pid in paper_ids], dtype=np.int64)
+        X = self.matrix(canonical)
+        known = rows >= 0
+        # select has a single 1 per known row, so the product gathers the rows
+        select = sp.csr_matrix((np.ones(known.sum(), dtype=np.float32),
+                                (np.flatnonzero(known), rows[known])), shape=(len(paper_ids), X.shape[0]))
+        return (select @ X).tocsr()
+
+    def keywords_of(self, paper_id, canonical=True):
+        row = self.row_of.get(paper_id)
+        if row is None:
+            return None
+        ids = self.indices[self.indptr[row]:self.indptr[row + 1]]
+        if canonical:
+            ids = self.canonical[ids]
+        return sorted(set(self.vocabulary[i] for i in ids.tolist()))
+
+    def to_cleaned_dict(self):
+        """Same content as temp/keywords_cleaned.json: {paper_id: {"title", "keywords"}}."""
+        return {pid: {"title": self.titles[row], "keywords": self.keywords_of(pid)}
+                for pid, row in self.row_of.items()}
+
+
+if __name__ == '__main__':
+    store = KeywordStore.build('temp/keywords_extracted.jsonl', 'temp/keyword_clusters.json')
+    store.save('temp/keyword_store')
+    # temp/keywords_cleaned.json is still written for the notebooks
+    with open('temp/keywords_cleaned.json', 'w') as f:
+        json.dump(store.to_cleaned_dict(), f, indent=4)
+    print(f"{len(store.paper_ids)} papers, {len(store.vocabulary)} keywords, saved to temp/keyword_store.npz/.json")
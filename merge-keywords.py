@@ -1,11 +1,15 @@
 import json
-from tqdm import tqdm
 from sentence_transformers import SentenceTransformer
-from sklearn.decomposition import PCA
 from collections import defaultdict
-import numpy as np
-import hdbscan
+import argparse
+import time
+import sys
+import os
 import gc
+from embedding_cache import EmbeddingCache
+from keyword_store import KeywordStore
+from keyword_merge import (CHUNK_SIZE, encode_to_memmap, incremental_pca, ann_cluster, cluster_stats,
+                           clean_keyword, KeywordClusters, update_cluster_file)
 
 """
 this script is to merge similar keywords extracted from scientific papers.
@@ -15,17 +19,66 @@ Output: a JSON file with merged keywords, and a JSON file with clusters of synon
 The alogorithm works as follows:
 1. Load the keywords from the JSONL file.
 2. Preprocess the keywords to remove unnecessary prefixes and symbols.
-3. Encode the keywords using a SentenceTransformer model.
-4. Reduce the dimensionality of the embeddings using PCA.
-5. Cluster the reduced embeddings using HDBSCAN.
+3. Encode the keywords using a SentenceTransformer model (through the embedding cache, see embedding_cache.py).
+4. Reduce the dimensionality of the embeddings using PCA (fitted incrementally, see keyword_merge.py).
+5. Cluster the reduced embeddings using HDBSCAN, or with --engine ann using the approximate
+   nearest neighbour engine of keyword_merge.py (LSH + cosine threshold + union-find).
 6. Create a mapping of keywords to their representative terms based on clustering.
+7. Save the state of the clusters (temp/keyword_state.json/.npz) for the incremental mode.
+
+With --incremental, only the papers of temp/keywords_extracted.jsonl that are not yet in
+temp/keywords_merged.json are processed: their new phrases are assigned to the nearest saved cluster
+(or open new ones) and both output files are updated in place. A full run is done instead when the
+drift since the last full clustering is above --max-drift.
 """
 
 
+parser = argparse.ArgumentParser(description="merge similar keywords")
+parser.add_argument("--engine", choices=["hdbscan", "ann"], default="hdbscan")
+parser.add_argument("--threshold", type=float, default=0.9,
+                    help="cosine similarity threshold of the ann engine and of the incremental assignment")
+parser.add_argument("--incremental", action="store_true", help="only assign the keywords of the new papers")
+parser.add_argument("--max-drift", type=float, default=0.05,
+                    help="share of new clusters (relative to the last full run) that triggers a full run")
+args = parser.parse_args()
+
 # ======== loading data ==========
 with open("temp/keywords_extracted.jsonl", "r") as f:
     data = [json.loads(line) for line in f]
 
+# ======== incremental mode ==========
+if args.incremental and os.path.exists("temp/keyword_state.json"):
+    start = time.time()
+    state = KeywordClusters.load("temp/keyword_state")
+    with open("./temp/keywords_merged.json", "r") as f:
+        result = json.load(f)
+    done = {paper["paper_id"] for paper in result}
+    new_papers = [paper for paper in data if paper["paper_id"] not in done]
+
+    new_phrases = {clean_keyword(kw) for paper in new_papers for kw in paper["keywords"]}
+    new_phrases = sorted(new_phrases - set(state.rep_of))
+    if new_phrases:
+        cache = EmbeddingCache("all-MiniLM-L6-v2")
+        model = SentenceTransformer("all-MiniLM-L6-v2") if cache.missing(new_phrases) else None
+        assigned, changed = state.assign(new_phrases, cache.encode(new_phrases, model), args.threshold)
+        update_cluster_file("temp/keyword_clusters.json", changed)
+
+    for paper in new_papers:
+        result.append({
+            "paper_id": paper["paper_id"],
+            "title": paper["title"],
+            "keywords": sorted(set(state.rep_of.get(kw, kw) for kw in paper["keywords"]))
+        })
+    with open("./temp/keywords_merged.json", "w") as f:
+        json.dump(result, f, indent=2)
+    state.save("temp/keyword_state")
+
+    print(f"{len(new_papers)} papers, {len(new_phrases)} new keywords assigned in {time.time() - start:.2f}s, "
+          f"drift {state.drift:.3f}")
+    if state.drift <= args.max_drift:
+        sys.exit(0)
+    print(f"drift above {args.max_drift}, full re-clustering")
+
 # ======== extracting all keyword phrases ==========
 all_keywords = set()
 for paper in data:
@@ -34,19 +87,31 @@ all_keywords = sorted(all_keywords)
 
 #========= preprocessing ==========
 
-# delete the spaces around hyphens
-all_keywords = [kw.replace(" - ", "-") for kw in all_keywords]
-# delete the title as prefix
-all_keywords = [kw.replace("title:", "") for kw in all_keywords]
-# 3. delete the "abstract:" prefix
-all_keywords = [kw.replace("abstract:", "") for kw in all_keywords]
-# 4. delete the "$" symbol
-all_keywords = [kw.replace("$", "") for kw in all_keywords]
+# delete the spaces around hyphens, the "title:" and "abstract:" prefixes and the "$" symbol
+all_keywords = [clean_keyword(kw) for kw in all_keywords]
+
+# ======== no keyword at all ==========
+# nothing to encode nor cluster: every paper keeps an empty list, there is no cluster, and the
+# saved cluster state (of an older corpus) is removed so that the next --incremental run is a full one
+if not all_keywords:
+    with open("./temp/keywords_merged.json", "w") as f:
+        json.dump([{"paper_id": paper["paper_id"], "title": paper["title"], "keywords": []} for paper in data],
+                  f, indent=2)
+    with open("temp/keyword_clusters.json", "w") as f:
+        json.dump({}, f, indent=4, ensure_ascii=False)
+    for state_path in ("temp/keyword_state.json", "temp/keyword_state.npz"):
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    print("no keywords to merge")
+    sys.exit(0)
 
 
 # ======== encoding keyword phrases ==========
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(all_keywords, show_progress_bar=True)
+# only the phrases that are not in the embedding cache are encoded,
+# chunk by chunk, into a float16 memory map
+cache = EmbeddingCache("all-MiniLM-L6-v2")
+model = SentenceTransformer("all-MiniLM-L6-v2") if cache.missing(all_keywords) else None
+embeddings = encode_to_memmap(all_keywords, cache, model, "temp/keyword_embeddings.npy", CHUNK_SIZE)
 
 
 
@@ -55,15 +120,24 @@ del model
 gc.collect()
 
 # ======== dimensionality reduction ==========
-
-pca = PCA(n_components=50)
-reduced_embeddings = pca.fit_transform(embeddings.astype(np.float32))
+# PCA fitted incrementally over the same chunks
+pca, reduced_embeddings = incremental_pca(embeddings, n_components=50, chunk_size=CHUNK_SIZE)
 
 
 
 # ======== clustering similar keywords ==========
-clusterer = hdbscan.HDBSCAN(min_cluster_size=3)
-labels = clusterer.fit_predict(reduced_embeddings)
+start = time.time()
+if args.engine == "hdbscan":
+    import hdbscan
+    clusterer = hdbscan.HDBSCAN(min_cluster_size=3)
+    labels = clusterer.fit_predict(reduced_embeddings)
+else:
+    labels = ann_cluster(reduced_embeddings, threshold=args.threshold)
+
+# speed and quality, to compare the two engines
+stats = cluster_stats(reduced_embeddings, labels)
+print(f"{args.engine}: {time.time() - start:.1f}s, {stats['clusters']} clusters, "
+      f"{stats['clustered']}/{len(all_keywords)} keywords clustered, cohesion {stats['cohesion']:.3f}")
 
 
 
@@ -83,15 +157,11 @@ for group in clusters.values():
         merge_dict[var] = rep
 
 # ======== replacing keywords in each paper ==========
-result = []
-for paper in tqdm(data, desc="Replacing keywords"):
-    new_keywords = [merge_dict.get(kw, kw) for kw in paper["keywords"]]
-    deduped = sorted(set(new_keywords))
-    result.append({
-        "paper_id": paper["paper_id"],
-        "title": paper["title"],
-        "keywords": deduped
-    })
+# the keywords are interned once (keyword_store.py), so the synonyms are replaced with a single
+# gather canonical[indices] over all the papers instead of one dict lookup per keyword
+store = KeywordStore.from_papers(data, merge_dict)
+result = [{"paper_id": paper_id, "title": title, "keywords": keywords}
+          for paper_id, title, keywords in zip(store.paper_ids, store.titles, store.canonical_keywords())]
 
 # ======== saving file ==========
 output_path = "./temp/keywords_merged.json"
@@ -119,3 +189,5 @@ with open("temp/keyword_clusters.json", "w") as f:
     json.dump(cluster_dict, f, indent=4, ensure_ascii=False)
 
 
+# ======== saving the cluster state for the incremental mode ==========
+KeywordClusters.from_full_run(all_keywords, reduced_embeddings, merge_dict, pca).save("temp/keyword_state")
@@ -1,8 +1,14 @@
 from sentence_transformers import SentenceTransformer
 from keyphrase_vectorizers import KeyphraseCountVectorizer
 from keybert import KeyBERT
+from multiprocessing import Pool
 from tqdm import tqdm
+from records import iter_records
+from embedding_cache import EmbeddingCache
+import argparse
+import torch
 import json
+import time
 import os
 
 # This script extracts keywords from the abstracts of scientific papers using KeyBERT.
@@ -12,64 +18,181 @@ import os
 # On the computer of Salle d'info, the GPU is a NVIDIA GeForce RTX 3090
 # it takes usually 3 hours to extract all keywords from 29555 abstracts
 
-# 初始化模型（使用 GPU）
-model = SentenceTransformer("all-MiniLM-L6-v2", device="cuda")
-kw_model = KeyBERT(model)
-vectorizer = KeyphraseCountVectorizer()
-
-# 加载论文数据
-with open("temp/papers_standardized.json") as f:
-    data = json.load(f)
-
-# 结果文件路径
-output_path = "temp/keywords_extracted.jsonl"
-
-# 如果文件存在，收集已处理的 paper_id
-processed_ids = set()
-if os.path.exists(output_path):
-    with open(output_path, "r") as f:
-        for line in f:
-            try:
-                entry = json.loads(line)
-                processed_ids.add(entry["paper_id"])
-            except json.JSONDecodeError:
-                continue  # 忽略损坏的行（例如意外中断）
-
-# 处理数据并实时写入
-with open(output_path, "a") as f_out:
-    with tqdm(total=len(data)) as pbar:
-        pbar.update(len(processed_ids))
-        for paper in data:
-            paper_id = paper.get("paper_id", "")
-            if paper_id in processed_ids:
-                continue
-
-            text = paper.get("abstract", "")
-            title = paper.get("title", "")
-            if title:
-                text = "Title:" + title + ". Abstract:" + text
-            if len(text.strip()) == 0:
-                continue
-
-            keywords = kw_model.extract_keywords(
-                text,
-                keyphrase_ngram_range=(1, 2),
-                top_n=3,
-                stop_words='english',
-                use_mmr=True,
-                diversity=0.5,
-                nr_candidates=30,
-                vectorizer=vectorizer
-            )
-
-            result_entry = {
-                "paper_id": paper_id,
-                "title": title,
-                "keywords": [kw[0] for kw in keywords]
-            }
-
-            f_out.write(json.dumps(result_entry) + "\n")
-            f_out.flush()  # 强制写盘，防止中途丢失
-
-            processed_ids.add(paper_id)
-            pbar.update(1)
+# Without a GPU, the abstracts are processed in batches: KeyBERT embeds all the documents of a
+# batch and all their candidate phrases in a few large model calls instead of one call per paper,
+# and the batches are shared between several worker processes, each with its own model.
+#
+#   python mot.py                                   # GPU if available, else CPU
+#   python mot.py --device cpu --workers 8 --batch-size 256
+#
+# The results are still appended to temp/keywords_extracted.jsonl and the papers already there are
+# skipped, so an interrupted run can be resumed. Writes are buffered and flushed every few batches.
+# With --embedding-cache, the embeddings of abstracts and candidate phrases are stored on disk and
+# reused by later runs and by merge-keywords.py.
+
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def load_models(device):
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    return model, KeyBERT(model), KeyphraseCountVectorizer()
+
+
+def paper_text(paper):
+    text = paper.get("abstract", "") or ""
+    title = paper.get("title", "")
+    if title:
+        text = "Title:" + title + ". Abstract:" + text
+    return text
+
+
+class _FittedVectorizer:
+    """A vectorizer already fitted on the batch: fit is a no-op, the vocabulary and transform are its own."""
+
+    def __init__(self, vectorizer):
+        self.vectorizer = vectorizer
+
+    def fit(self, texts):
+        return self
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def get_feature_names_out(self):
+        return self.vectorizer.get_feature_names_out()
+
+
+def extract_batch(kw_model, vectorizer, texts, model=None, cache=None):
+    """
+    Keywords of several texts with one extract_keywords call.
+    With an EmbeddingCache, the documents and candidate phrases already embedded in a previous run
+    are taken from the cache and only the new ones are given to the model.
+    """
+    embeddings = {}
+    if cache is not None:
+        # the keyphrases (POS tagging) are found once here and KeyBERT gets the fitted vectorizer,
+        # so its own fit(texts) does not tag the batch a second time
+        try:
+            vectorizer = _FittedVectorizer(vectorizer.fit(texts))
+        except ValueError:
+            # no keyphrase in the whole batch (empty vocabulary): no keyword for any paper
+            return [[] for _ in texts]
+        words = vectorizer.get_feature_names_out().tolist()
+        embeddings["doc_embeddings"] = cache.encode(texts, model)
+        embeddings["word_embeddings"] = cache.encode(words, model)
+
+    keywords = kw_model.extract_keywords(
+        texts,
+        keyphrase_ngram_range=(1, 2),
+        top_n=3,
+        stop_words='english',
+        use_mmr=True,
+        diversity=0.5,
+        nr_candidates=30,
+        vectorizer=vectorizer,
+        **embeddings
+    )
+    # KeyBERT returns a flat list when there is a single document
+    if len(texts) == 1:
+        keywords = [keywords]
+    # KeyBERT returns [] when the batch has no keyphrase: every paper still gets an (empty) entry
+    keywords = list(keywords) + [[]] * (len(texts) - len(keywords))
+    return [[kw[0] for kw in kws] for kws in keywords]
+
+
+# 每个进程自己的模型
+# the model of each worker process
+_worker = {}
+
+
+def _init_worker(device, threads, use_cache):
+    torch.set_num_threads(threads)
+    _worker["model"], _worker["kw_model"], _worker["vectorizer"] = load_models(device)
+    _worker["cache"] = EmbeddingCache(MODEL_NAME) if use_cache else None
+
+
+def _extract_worker(batch):
+    # batch: list of (paper_id, title, text)
+    texts = [text for _, _, text in batch]
+    keywords = extract_batch(_worker["kw_model"], _worker["vectorizer"], texts,
+                             model=_worker["model"], cache=_worker["cache"])
+    return [
+        {"paper_id": paper_id, "title": title, "keywords": kws}
+        for (paper_id, title, _), kws in zip(batch, keywords)
+    ]
+
+
+def load_processed_ids(output_path):
+    # 如果文件存在，收集已处理的 paper_id
+    processed_ids = set()
+    if os.path.exists(output_path):
+        with open(output_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    processed_ids.add(entry["paper_id"])
+                except json.JSONDecodeError:
+                    continue  # 忽略损坏的行（例如意外中断）
+    return processed_ids
+
+
+def run(input_path, output_path, device, workers=1, batch_size=64, checkpoint_every=10, use_cache=False):
+    data = list(iter_records(input_path))
+    processed_ids = load_processed_ids(output_path)
+
+    pending = []
+    for paper in data:
+        paper_id = paper.get("paper_id", "")
+        if paper_id in processed_ids:
+            continue
+        text = paper_text(paper)
+        if len(text.strip()) == 0:
+            continue
+        pending.append((paper_id, paper.get("title", ""), text))
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if workers == 1:
+        _init_worker(device, threads, use_cache)
+        pool = None
+        results = map(_extract_worker, batches)
+    else:
+        pool = Pool(workers, initializer=_init_worker, initargs=(device, threads, use_cache))
+        results = pool.imap_unordered(_extract_worker, batches)
+
+    # 处理数据并分批写入，每 checkpoint_every 个 batch 写盘一次
+    try:
+        with open(output_path, "a", buffering=1 << 20) as f_out:
+            with tqdm(total=len(data)) as pbar:
+                pbar.update(len(processed_ids))
+                for n_batches, entries in enumerate(results, 1):
+                    for result_entry in entries:
+                        f_out.write(json.dumps(result_entry) + "\n")
+                        processed_ids.add(result_entry["paper_id"])
+                    pbar.update(len(entries))
+                    if n_batches % checkpoint_every == 0:
+                        f_out.flush()  # 定期写盘，防止中途丢失
+                        os.fsync(f_out.fileno())
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="extract keywords from the abstracts with KeyBERT")
+    parser.add_argument("--input", default="temp/papers_standardized.json")
+    parser.add_argument("--output", default="temp/keywords_extracted.jsonl")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes, each with its own model (for CPU)")
+    parser.add_argument("--batch-size", type=int, default=64, help="abstracts per extract_keywords call")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="flush the output every N batches")
+    parser.add_argument("--embedding-cache", action="store_true",
+                        help="reuse the embeddings stored in temp/embedding_cache (see embedding_cache.py)")
+    args = parser.parse_args()
+
+    start = time.time()
+    run(args.input, args.output, args.device, args.workers, args.batch_size, args.checkpoint_every,
+        args.embedding_cache)
+    print(f"Finish in {time.time() - start:.0f}s, keywords saved to {args.output}")
@@ -20,6 +20,7 @@ import os
 import json
 import re
 import csv
+from functools import lru_cache
 
 institution_keywords = [
     # 机构
@@ -42,9 +43,21 @@ institution_keywords = [
 
 
 
+# 所有机构关键词合并成一个预编译的正则
+# all the institution keywords in one precompiled matcher
+_INSTITUTION_RE = re.compile('|'.join(re.escape(k) for k in institution_keywords))
+_ABBREVIATION_RE = re.compile(r'^[A-Z][A-Z\s.-]{3,}$')
+_SPACES_RE = re.compile(r'\s+')
+_PARENTHESES_RE = re.compile(r'\([^()]*\)')
+_SEPARATOR_RE = re.compile(r',| and ')
+_NON_LATIN_RE = re.compile(r'[^a-zA-Z .]')
+_AFFILIATION_RE = re.compile(r'\b(?:univ|institute|college|school)\b.*')
+_QUOTES = str.maketrans('', '', '"\'')
+
+
 def is_institution(name):
     name_lower = name.lower()
-    if any(keyword in name_lower for keyword in institution_keywords):
+    if _INSTITUTION_RE.search(name_lower):
         return True
     # 再加一个规则：如果名字含有 email 地址或 @
     # Add another rule: if the name contains an email address or @
@@ -52,48 +65,53 @@ def is_institution(name):
         return True
     # 或者：如果名字看起来像缩写（全大写且长度>3）
     # Or: if the name looks like an abbreviation (all uppercase and length > 3)
-    if re.match(r'^[A-Z][A-Z\s.-]{3,}$', name):
+    if _ABBREVIATION_RE.match(name):
         return True
     return False
 
-def extract_author(authors):
-    
-    # delete all the s
-    authors = re.sub(r'\s+', ' ', authors)  
-    # 去掉双引号
-    # remove double quotes
-    authors = re.sub(r'\"', '', authors)  
-    # 去掉单引号
-    # remove single quotes
-    authors = re.sub(r'\'', '', authors)  
+
+# 有上限的缓存，流式处理时内存不随语料增长
+# a bounded cache, so that streaming a whole corpus (convert.py) keeps a constant memory
+@lru_cache(maxsize=65536)
+def _extract_author_cached(authors):
+    # 合并空格，同时去掉单双引号
+    # collapse the spaces and remove the double and single quotes in one go
+    authors = _SPACES_RE.sub(' ', authors).translate(_QUOTES)
     # 去括号内容
     # remove content in parentheses
     while '(' in authors and ')' in authors:
-        authors = re.sub(r'\([^()]*\)', '', authors) 
+        authors = _PARENTHESES_RE.sub('', authors)
     # 按逗号或"and"分割
     # split by comma or "and"
-    authors = re.split(r',| and ', authors)  
-    # 去掉多余的空格
-    # remove extra spaces
-    authors = [a.strip() for a in authors if a.strip()]
-    # 只保留拉丁字母
-    # keep only Latin letters
-    authors = [re.sub(r'[^a-zA-Z .]', '', a) for a in authors]
-
-    authors = [re.sub(r'\s+', ' ', a) for a in authors]
-    # 首字母大写
-    # capitalize the first letter
-    authors = [a.title() for a in authors]  
-    authors = [a.replace("Nieegawa", "Niegawa") for a in authors]
-    #删除所有university, institute, college, school 及其后面的内容
-    # remove all university, institute, college, school and the content after it
-    authors = [re.sub(r'\b(?:univ|institute|college|school)\b.*', '', a) for a in authors]
-    sorted(authors)
     clean_names = []
-    for name in authors:
-        if not is_institution(name):
-            clean_names.append(name.strip())
-    return clean_names
+    for a in _SEPARATOR_RE.split(authors):
+        if not a.strip():
+            continue
+        # 只保留拉丁字母，合并空格，首字母大写
+        # keep only Latin letters, collapse the spaces, capitalize the first letter
+        a = _SPACES_RE.sub(' ', _NON_LATIN_RE.sub('', a.strip())).title()
+        a = a.replace("Nieegawa", "Niegawa")
+        #删除所有university, institute, college, school 及其后面的内容
+        # remove all university, institute, college, school and the content after it
+        a = _AFFILIATION_RE.sub('', a)
+        if not is_institution(a):
+            clean_names.append(a.strip())
+    return tuple(clean_names)
+
+
+def extract_author(authors):
+    # 同一个作者字符串经常重复出现，结果按原字符串缓存
+    # the same authors string appears many times, the result is cached on the raw string
+    return list(_extract_author_cached(authors))
+
+
+def extract_authors_batch(authors_strings):
+    """
+    Yield the list of clean names for every authors string of the iterable.
+    Empty or missing strings (None) give an empty list.
+    """
+    for authors in authors_strings:
+        yield extract_author(authors) if authors else []
 
 
 
@@ -102,13 +120,13 @@ def process_abstracts(path):
     
     # 读取output.json文件中的authors字段
     # Read the authors field from output.json
-    with open("temp/output.json", "r", encoding="utf-8") as json_file:
-        data = json.load(json_file) 
-        for item in data:
-            authors = item.get("authors", "")
-            if authors:
-                authors = extract_author(authors)
-                authors_set.update(authors)
+    with open(path, "r", encoding="utf-8") as json_file:
+        if path.endswith(".jsonl"):
+            data = (json.loads(line) for line in json_file if line.strip())
+        else:
+            data = json.load(json_file)
+        for authors in extract_authors_batch(item.get("authors", "") for item in data):
+            authors_set.update(authors)
 
     # 将authors按字母排序
     # Sort authors alphabetically
@@ -122,8 +140,9 @@ def process_abstracts(path):
         for author in authors_set:
             writer.writerow([author])
 
-    print("Extraction completed. Data saved to temp/output.json and temp/authors.csv")
+    print(f"Extraction completed. Data read from {path} and saved to temp/authors.csv")
 
-# 示例调用
-# Example call
-process_abstracts("temp/output.json")
+if __name__ == '__main__':
+    # 示例调用
+    # Example call
+    process_abstracts("temp/output.json")
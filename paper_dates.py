@@ -0,0 +1,94 @@
+import numpy as np
+
+"""
+Submission month of every paper, as an integer array aligned with the paper ids.
+
+A month is stored as the number of months since January 1992 (the start of hep-th), so
+month differences are plain subtractions and a whole graph fits in an int16 array:
+
+    months = month_index(citation_csr.ids)      # -1 when the date is unknown
+    month_label(months[i])                      # "1997-03"
+
+The dates come from assets/Cit-HepTh-dates.txt. Cross-listed papers appear there as 11<mmnnn>
+(or 12<mmnnn>), the arXiv number without its year; the year is taken from the date itself. When
+a paper has several dates, the earliest is kept; papers missing from the file fall back to the
+yymm of their arXiv number, then to January of their year when years are given.
+"""
+
+DATES_PATH = 'assets/Cit-HepTh-dates.txt'
+START_YEAR = 1992
+
+
+def month_of(year, month):
+    return (year - START_YEAR) * 12 + (month - 1)
+
+
+def month_label(month):
+    """"YYYY-MM" of a month offset ("Unknown" for -1)."""
+    if month < 0:
+        return "Unknown"
+    year, month = divmod(int(month), 12)
+    return f"{START_YEAR + year:04d}-{month + 1:02d}"
+
+
+def month_from_id(paper_id):
+    """Month offset given by the yymm of an arXiv number (7 digits), -1 if it is not one."""
+    if len(paper_id) != 7 or not paper_id[:4].isdigit():
+        return -1
+    year, month = int(paper_id[:2]), int(paper_id[2:4])
+    if not 1 <= month <= 12:
+        return -1
+    year += 1900 if year >= 90 else 2000
+    return month_of(year, month)
+
+
+def _true_id(paper_id, year, month):
+    """arXiv number of a cross-listed id 1<y><mmnnn>, using the year of its submission date."""
+    id_month = int(paper_id[2:4])
+    # submitted on the last days of December / the first days of January
+    if id_month == 12 and month == 1:
+        year -= 1
+    elif id_month == 1 and month == 12:
+        year += 1
+    return f"{year % 100:02d}{paper_id[2:]}"
+
+
+def read_dates(path=DATES_PATH):
+    """{paper_id: month offset} of the dates file (earliest date of each paper)."""
+    direct, cross_listed = {}, {}
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            paper_id, date = parts
+            paper_id = paper_id.zfill(7)
+            year, month = int(date[:4]), int(date[5:7])
+            if paper_id[:2] in ('11', '12'):
+                target = cross_listed
+                paper_id = _true_id(paper_id, year, month)
+            else:
+                target = direct
+            m = month_of(year, month)
+            if paper_id not in target or m < target[paper_id]:
+                target[paper_id] = m
+    # a paper listed under its own number keeps that date
+    for paper_id, m in cross_listed.items():
+        direct.setdefault(paper_id, m)
+    return direct
+
+
+def month_index(ids, path=DATES_PATH, fallback_to_id=True, years=None):
+    """int16 month offsets of the papers ids (-1 when unknown). years: the "year" of each paper, or None."""
+    dates = read_dates(path)
+    months = np.full(len(ids), -1, dtype=np.int16)
+    for i, paper_id in enumerate(ids.tolist() if hasattr(ids, 'tolist') else ids):
+        m = dates.get(paper_id, -1)
+        if m < 0 and fallback_to_id:
+            m = month_from_id(paper_id)
+        if m < 0 and years is not None and years[i]:
+            m = month_of(int(years[i]), 1)
+        months[i] = m
+    return months
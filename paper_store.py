@@ -0,0 +1,242 @@
+import argparse
+import os
+import sqlite3
+
+"""
+All the papers in one SQLite database (temp/papers.db), instead of a {paper_id: paper} dict
+rebuilt from a large JSON file by every script and notebook.
+
+    papers          id, paper_id (unique), title, abstract, year and the other fields of
+                    temp/papers_standardized.json
+    authors         id, name (unique)
+    paper_authors   paper, author, position (order of the names on the paper)
+    citations       citing, cited (paper ids, as in assets/Cit-HepTh.txt, zero-padded to 7 digits)
+    keywords        paper_id, keyword (the cleaned keywords of keyword.ipynb)
+    papers_fts      FTS5 index on title and abstract, kept in sync with papers by triggers
+
+with indexes on the paper ids, the authors, the years and the keywords. The add_* methods
+bulk-load any iterable of records (e.g. iter_records of records.py) in a single transaction and
+replace the papers already stored, so a stage can be loaded again after a rerun.
+
+    with PaperStore() as store:
+        store.add_papers(iter_records('temp/papers_standardized.json'))
+        store.add_citations_file('assets/Cit-HepTh.txt')
+        store.papers_by("Edward Witten", year=1998, citing="9711200")
+        store.search('"matrix model" AND toda*')
+        papers = store.as_dict()        # same dict as {p["paper_id"]: p for p in json.load(...)}
+"""
+
+DB_PATH = 'temp/papers.db'
+FIELDS = ["title", "abstract", "year", "from", "submitted", "comments", "report_no", "journal_ref",
+          "subject_class", "proxy"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY,
+    paper_id TEXT NOT NULL UNIQUE,
+    title TEXT, abstract TEXT, year INTEGER, "from" TEXT, submitted TEXT, comments TEXT,
+    report_no TEXT, journal_ref TEXT, subject_class TEXT, proxy TEXT
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS paper_authors (
+    paper INTEGER NOT NULL REFERENCES papers(id),
+    author INTEGER NOT NULL REFERENCES authors(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (paper, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS citations (
+    citing TEXT NOT NULL,
+    cited TEXT NOT NULL,
+    PRIMARY KEY (citing, cited)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS keywords (
+    paper_id TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (paper_id, keyword)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS papers_year ON papers(year);
+CREATE INDEX IF NOT EXISTS paper_authors_author ON paper_authors(author, paper);
+CREATE INDEX IF NOT EXISTS citations_cited ON citations(cited, citing);
+CREATE INDEX IF NOT EXISTS keywords_keyword ON keywords(keyword, paper_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(title, abstract, content='papers', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES ('delete', old.id, old.title, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES ('delete', old.id, old.title, old.abstract);
+    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+END;
+"""
+
+_COLUMNS = ", ".join(f'"{field}"' for field in FIELDS)
+_UPSERT_PAPER = (f"INSERT INTO papers (paper_id, {_COLUMNS}) VALUES ({', '.join('?' * (len(FIELDS) + 1))}) "
+                 f"ON CONFLICT(paper_id) DO UPDATE SET "
+                 + ", ".join(f'"{field}" = excluded."{field}"' for field in FIELDS))
+
+
+class PaperStore:
+    def __init__(self, path=DB_PATH):
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    # ---- bulk loads ----
+
+    def add_papers(self, papers):
+        """Insert or replace the papers (dicts of papers_standardized.json) and their authors; returns the count."""
+        n = 0
+        with self.db:
+            author_ids = {}
+            for paper in papers:
+                self.db.execute(_UPSERT_PAPER, [paper["paper_id"]] + [paper.get(field) for field in FIELDS])
+                row = self.db.execute("SELECT id FROM papers WHERE paper_id = ?", (paper["paper_id"],)).fetchone()[0]
+                self.db.execute("DELETE FROM paper_authors WHERE paper = ?", (row,))
+                links = []
+                for position, name in enumerate(paper.get("authors") or []):
+                    if name not in author_ids:
+                        self.db.execute("INSERT OR IGNORE INTO authors (name) VALUES (?)", (name,))
+                        author_ids[name] = self.db.execute("SELECT id FROM authors WHERE name = ?",
+                                                           (name,)).fetchone()[0]
+                    links.append((row, author_ids[name], position))
+                self.db.executemany("INSERT INTO paper_authors (paper, author, position) VALUES (?, ?, ?)", links)
+                n += 1
+        return n
+
+    def add_citations(self, edges):
+        """(citing, cited) pairs of paper ids; the pairs already stored are ignored."""
+        with self.db:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO citations (citing, cited) VALUES (?, ?)", edges)
+            return self.db.total_changes - before
+
+    def add_citations_file(self, path='assets/Cit-HepTh.txt'):
+        """Citations of a SNAP edge list, with the ids zero-padded to 7 digits like citation_graph.py."""
+        def edges():
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.startswith('#'):
+                        continue
+                    parts = line.split()
+                    if len(parts) == 2:
+                        yield parts[0].zfill(7), parts[1].zfill(7)
+        return self.add_citations(edges())
+
+    def add_keywords(self, keywords):
+        """{paper_id: {"keywords": [...]}} (temp/keywords_cleaned.json) or {paper_id: [...]}; replaces those papers' keywords."""
+        with self.db:
+            for paper_id, entry in keywords.items():
+                words = (entry.get("keywords") or []) if isinstance(entry, dict) else entry
+                self.db.execute("DELETE FROM keywords WHERE paper_id = ?", (paper_id,))
+                self.db.executemany("INSERT OR IGNORE INTO keywords (paper_id, keyword) VALUES (?, ?)",
+                                    [(paper_id, word) for word in words])
+
+    # ---- queries ----
+
+    def query(self, sql, params=()):
+        return self.db.execute(sql, params).fetchall()
+
+    def get(self, paper_id):
+        """The paper as a dict of papers_standardized.json (None if it is not stored)."""
+        row = self.db.execute("SELECT * FROM papers WHERE paper_id = ?", (paper_id,)).fetchone()
+        return None if row is None else self._record(row)
+
+    def _record(self, row):
+        paper = {"paper_id": row["paper_id"]}
+        paper.update({field: row[field] for field in FIELDS})
+        paper["authors"] = [name for (name,) in self.db.execute(
+            "SELECT a.name FROM paper_authors pa JOIN authors a ON a.id = pa.author "
+            "WHERE pa.paper = ? ORDER BY pa.position", (row["id"],))]
+        return paper
+
+    def as_dict(self):
+        """{paper_id: paper} of all the papers."""
+        authors = {}
+        for paper, name in self.db.execute("SELECT pa.paper, a.name FROM paper_authors pa "
+                                           "JOIN authors a ON a.id = pa.author ORDER BY pa.paper, pa.position"):
+            authors.setdefault(paper, []).append(name)
+        papers = {}
+        for row in self.db.execute("SELECT * FROM papers ORDER BY id"):
+            paper = {"paper_id": row["paper_id"]}
+            paper.update({field: row[field] for field in FIELDS})
+            paper["authors"] = authors.get(row["id"], [])
+            papers[row["paper_id"]] = paper
+        return papers
+
+    def papers_by(self, author, year=None, citing=None):
+        """Paper ids of an author, optionally of one year and / or citing a given paper."""
+        sql = ("SELECT p.paper_id FROM authors a JOIN paper_authors pa ON pa.author = a.id "
+               "JOIN papers p ON p.id = pa.paper")
+        conditions, params = ["a.name = ?"], [author]
+        if citing is not None:
+            sql += " JOIN citations c ON c.citing = p.paper_id"
+            conditions.append("c.cited = ?")
+            params.append(citing)
+        if year is not None:
+            conditions.append("p.year = ?")
+            params.append(year)
+        sql += " WHERE " + " AND ".join(conditions) + " ORDER BY p.paper_id"
+        return [paper_id for (paper_id,) in self.db.execute(sql, params)]
+
+    def references(self, paper_id):
+        """Papers cited by paper_id."""
+        return [cited for (cited,) in self.db.execute(
+            "SELECT cited FROM citations WHERE citing = ? ORDER BY cited", (paper_id,))]
+
+    def cited_by(self, paper_id):
+        """Papers citing paper_id."""
+        return [citing for (citing,) in self.db.execute(
+            "SELECT citing FROM citations WHERE cited = ? ORDER BY citing", (paper_id,))]
+
+    def papers_with_keyword(self, keyword):
+        return [paper_id for (paper_id,) in self.db.execute(
+            "SELECT paper_id FROM keywords WHERE keyword = ? ORDER BY paper_id", (keyword,))]
+
+    def search(self, match, limit=20):
+        """(paper_id, title) of the best matches of an FTS5 query on the titles and abstracts."""
+        return [tuple(row) for row in self.db.execute(
+            "SELECT p.paper_id, p.title FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid "
+            "WHERE papers_fts MATCH ? ORDER BY bm25(papers_fts) LIMIT ?", (match, limit))]
+
+
+if __name__ == '__main__':
+    import json
+    from records import iter_records
+
+    parser = argparse.ArgumentParser(description="build (or update) the SQLite paper store")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--papers", default="temp/papers_standardized.json")
+    parser.add_argument("--citations", default="assets/Cit-HepTh.txt")
+    parser.add_argument("--keywords", default="temp/keywords_cleaned.json")
+    args = parser.parse_args()
+
+    with PaperStore(args.db) as store:
+        n = store.add_papers(iter_records(args.papers))
+        print(f"{n} papers loaded from {args.papers}")
+        if os.path.exists(args.citations):
+            print(f"{store.add_citations_file(args.citations)} citations loaded from {args.citations}")
+        if os.path.exists(args.keywords):
+            with open(args.keywords, 'r', encoding='utf-8') as f:
+                store.add_keywords(json.load(f))
+            print(f"keywords loaded from {args.keywords}")
@@ -0,0 +1,81 @@
+import json
+
+"""
+Streaming read/write of the record files in temp/ (output.json, papers_standardized.json, ...).
+
+Both formats are supported, chosen by the extension:
+- .jsonl: one JSON object per line
+- .json: one JSON list, as written by json.dump(records, f, indent=2)
+
+iter_records yields the records one by one without loading the whole file, and write_records
+writes them as they come, so a whole pipeline stage runs in constant memory. write_records
+produces exactly the same bytes as json.dump(list(records), f, ensure_ascii=..., indent=2).
+"""
+
+CHUNK_SIZE = 1 << 16
+
+
+def iter_records(path):
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # ignore a truncated last line (e.g. interrupted run)
+        return
+
+    # a JSON list, decoded element by element
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(CHUNK_SIZE)
+        eof = not buffer
+        pos = _skip(buffer, 0, ' \t\r\n')
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError(f"{path} is not a JSON list")
+        pos += 1
+        while True:
+            pos = _skip(buffer, pos, ' \t\r\n,')
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("need more data", buffer, pos)
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # the next element is not complete yet: drop what is consumed and read more
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield record
+            pos = end
+
+
+def _skip(buffer, pos, chars):
+    while pos < len(buffer) and buffer[pos] in chars:
+        pos += 1
+    return pos
+
+
+def write_records(path, records, ensure_ascii=False):
+    """Write the records (any iterable) as they are produced. Returns the number written."""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=ensure_ascii) + '\n')
+                count += 1
+            return count
+
+        for record in records:
+            f.write('[\n  ' if count == 0 else ',\n  ')
+            f.write(json.dumps(record, ensure_ascii=ensure_ascii, indent=2).replace('\n', '\n  '))
+            count += 1
+        f.write('\n]' if count else '[]')
+    return count
@@ -1,6 +1,7 @@
 import pandas as pd
 import re
 import json
+from collections import defaultdict
 
 """"
 The input of this script is temp/authors.csv, which contains a column named 'authors'.
@@ -131,8 +132,13 @@ def normalize_name(name):
 
 
 def is_variant(name1, name2):
-    fn1, ln1 = parse_name(name1)
-    fn2, ln2 = parse_name(name2)
+    return is_variant_parsed(parse_name(name1), parse_name(name2))
+
+
+def is_variant_parsed(parsed1, parsed2):
+    """is_variant on the (first_names, last_name) already returned by parse_name"""
+    fn1, ln1 = parsed1
+    fn2, ln2 = parsed2
 
     # 姓氏不同，肯定不是
     # Different last names, definitely not variants
@@ -165,6 +171,18 @@ def is_variant(name1, name2):
     return False
 
 
+def block_keys(parsed):
+    """
+    Keys of a parsed name inside its last-name bucket.
+    Two names with the same last name are variants (is_variant) iff they share a key:
+    - a shared first name or an equal non-empty first-name string implies a shared initial,
+    - names without first names are only variants of each other (key '').
+    """
+    first_names, _ = parsed
+    initials = set(f[0].lower() for f in first_names if f)
+    return initials if initials else {''}
+
+
 
 
 #############################################
@@ -190,82 +208,119 @@ class UnionFind:
             self.parent[root_y] = root_x
 
 #############################################
-# 读取数据
-# read data
-#############################################
-
-df = pd.read_csv('temp/authors.csv')
-
-# 清洗，确保所有名字是字符串
-# Clean and ensure all names are strings
-df['author_clean'] = df['authors'].fillna('').str.strip().str.title()
-
-names = df['author_clean'].dropna().unique().tolist()
-
-#############################################
-# 并查集：合并所有变体
-# Union-Find: Merge all variants
-#############################################
-
-uf = UnionFind()
-
-# 两两比较，符合 is_variant 的合并
-# Compare pairs and merge if they are variants
-for i in range(len(names)):
-    for j in range(i + 1, len(names)):
-        name1 = names[i]
-        name2 = names[j]
-        if is_variant(name1, name2):
-            uf.union(name1, name2)
-
-#############################################
-# 生成标准名 -> 变体列表 映射
-# Generate standard name -> variant list mapping
+# 分块合并
+# Blocked merging
 #############################################
 
-groups = {}
-for name in names:
-    root = uf.find(name)
-    if root not in groups:
-        groups[root] = []
-    groups[root].append(name)
-
-# 选择 group 中最长的名字做标准名
-# Choose the longest name in the group as the standard name
-standard_name_mapping = {}
-for group_names in groups.values():
-    standard_name = max(group_names, key=lambda n: len(n))
-    for var in group_names:
-        standard_name_mapping[normalize_name(var)] = standard_name
-
-#############################################
-# 替换原数据中的名字
-# Replace names in the original data
-#############################################
-
-def replace_with_standard(name):
-    return standard_name_mapping.get(normalize_name(name), name)
-
-df['standard_author'] = df['author_clean'].apply(replace_with_standard)
-
-#############################################
-# 导出 CSV
-# Export CSV
-#############################################
-
-df[['authors', 'standard_author']].to_csv('temp/authors_standardized.csv', index=False, encoding='utf-8')
-print(" all authors standardized and saved to temp/authors_standardized.csv")
-#############################################
-# 导出 JSON
-# Export JSON
-#############################################
-
-author_variants = {}
-for group_names in groups.values():
-    standard_name = max(group_names, key=lambda n: len(n))
-    author_variants[standard_name] = sorted(group_names)
-
-with open('temp/author_variants.json', 'w', encoding='utf-8') as f:
-    json.dump(author_variants, f, ensure_ascii=False, indent=4)
-
-print("exported author_variants.json")
+def merge_variants(names, uf=None):
+    """
+    Same grouping as comparing every pair with is_variant, in near-linear time:
+    each name is parsed once, names are bucketed by lowercase last name (different last
+    names are never variants), and inside a bucket every name is united with the first
+    name seen for each of its block_keys.
+    Returns the UnionFind.
+    """
+    if uf is None:
+        uf = UnionFind()
+
+    buckets = defaultdict(list)
+    for name in names:
+        first_names, last_name = parse_name(name)
+        buckets[last_name.lower()].append((name, (first_names, last_name)))
+
+    for bucket in buckets.values():
+        first_with_key = {}
+        for name, parsed in bucket:
+            uf.find(name)
+            for key in block_keys(parsed):
+                if key in first_with_key:
+                    uf.union(first_with_key[key], name)
+                else:
+                    first_with_key[key] = name
+    return uf
+
+
+def build_groups(names, uf):
+    """root -> list of names, in the order of names"""
+    groups = {}
+    for name in names:
+        root = uf.find(name)
+        if root not in groups:
+            groups[root] = []
+        groups[root].append(name)
+    return groups
+
+
+def pick_standard_name(group_names):
+    # 选择 group 中最长的名字做标准名
+    # Choose the longest name in the group as the standard name
+    return max(group_names, key=lambda n: len(n))
+
+
+if __name__ == '__main__':
+    #############################################
+    # 读取数据
+    # read data
+    #############################################
+
+    df = pd.read_csv('temp/authors.csv')
+
+    # 清洗，确保所有名字是字符串
+    # Clean and ensure all names are strings
+    df['author_clean'] = df['authors'].fillna('').str.strip().str.title()
+
+    names = df['author_clean'].dropna().unique().tolist()
+
+    #############################################
+    # 并查集：合并所有变体
+    # Union-Find: Merge all variants
+    #############################################
+
+    # 按姓氏分块，只在块内合并
+    # Bucket by last name and merge only inside the buckets
+    uf = merge_variants(names)
+
+    #############################################
+    # 生成标准名 -> 变体列表 映射
+    # Generate standard name -> variant list mapping
+    #############################################
+
+    groups = build_groups(names, uf)
+
+    standard_name_mapping = {}
+    for group_names in groups.values():
+        standard_name = pick_standard_name(group_names)
+        for var in group_names:
+            standard_name_mapping[normalize_name(var)] = standard_name
+
+    #############################################
+    # 替换原数据中的名字
+    # Replace names in the original data
+    #############################################
+
+    def replace_with_standard(name):
+        return standard_name_mapping.get(normalize_name(name), name)
+
+    df['standard_author'] = df['author_clean'].apply(replace_with_standard)
+
+    #############################################
+    # 导出 CSV
+    # Export CSV
+    #############################################
+
+    df[['authors', 'standard_author']].to_csv('temp/authors_standardized.csv', index=False, encoding='utf-8')
+    print(" all authors standardized and saved to temp/authors_standardized.csv")
+    #############################################
+    # 导出 JSON
+    # Export JSON
+    #############################################
+
+    author_variants = {}
+    for group_names in groups.values():
+        standard_name = pick_standard_name(group_names)
+        author_variants[standard_name] = sorted(group_names)
+
+    with open('temp/author_variants.json', 'w', encoding='utf-8') as f:
+        json.dump(author_variants, f, ensure_ascii=False, indent=4)
+
+    print("exported author_variants.json")
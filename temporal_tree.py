@@ -0,0 +1,130 @@
+import numpy as np
+import networkx as nx
+from paper_dates import month_label, month_of
+
+"""
+Temporal citation trees around a set of root papers (the trees drawn at the end of keyword.ipynb).
+
+From each root, a breadth-first search follows the references (direction="forward": the older
+papers it cites, recursively) or the citations (direction="backward": the newer papers citing
+it), keeping only the papers dated before (resp. after) the root, at most max_month_diff months
+away, and with a title. Each paper is entered once per root, from the first paper that reaches it.
+
+The search works on the CSR arrays and the month array of paper_dates.py: a whole frontier is
+expanded with one gather and filtered with vector masks, in the same order as the one-node-at-a-
+time deque version, so the trees (and the layout) are the same.
+
+    months = month_index(citation_csr.ids)
+    G_structured = build_temporal_tree(G, citation_csr, months, top_ids)
+"""
+
+
+def _gather(indptr, indices, frontier):
+    """(src, dst) of the edges leaving frontier, in the order of frontier."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    src = np.repeat(frontier, counts)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+    return src, indices[offsets]
+
+
+def tree_edges(indptr, indices, months, root, allowed, direction="forward", max_month_diff=120):
+    """
+    (parents, children) of the tree of root, in order of discovery. allowed: boolean mask of the
+    nodes that may enter a tree (the other roots and the papers without a title are excluded).
+    """
+    visited = np.zeros(len(months), dtype=bool)
+    visited[root] = True
+    root_month = int(months[root])
+    parents, children = [], []
+    frontier = np.array([root], dtype=np.int64)
+    while frontier.size:
+        src, dst = _gather(indptr, indices, frontier)
+        new = ~visited[dst] & (dst != root)
+        src, dst = src[new], dst[new]
+        # the first edge reaching a node wins, as in a sequential breadth-first search
+        _, first = np.unique(dst, return_index=True)
+        first.sort()
+        src, dst = src[first], dst[first]
+        visited[dst] = True
+
+        delta = months[dst].astype(np.int64) - root_month
+        keep = allowed[dst] & (months[dst] >= 0) & (np.abs(delta) <= max_month_diff)
+        keep &= (delta < 0) if direction == "forward" else (delta > 0)
+        parents.append(src[keep])
+        children.append(dst[keep])
+        frontier = dst[keep]
+    if not parents:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(parents), np.concatenate(children)
+
+
+def _rank_in_layer(delta):
+    """For each element, how many earlier elements have the same delta."""
+    order = np.argsort(delta, kind='stable')
+    sorted_delta = delta[order]
+    group_start = np.flatnonzero(np.r_[True, sorted_delta[1:] != sorted_delta[:-1]])
+    sizes = np.diff(np.r_[group_start, len(delta)])
+    rank = np.empty(len(delta), dtype=np.int64)
+    rank[order] = np.arange(len(delta)) - np.repeat(group_start, sizes)
+    return rank
+
+
+def build_subtree(G, graph, months, root_ids, direction="forward", x_spacing=6000, d=250, delta=8,
+                  max_month_diff=120, align=(2003, 4)):
+    """
+    nx.DiGraph of the trees of the roots, laid out in columns (one per root, x_spacing apart) with
+    y given by the month (d per month, align at y = 0). The titles and colors come from G, the
+    nodes are "<paper>_from_<root>".
+    """
+    G_sub = nx.DiGraph()
+    ids = graph.ids.tolist()
+    indptr, indices = (graph.indptr, graph.indices) if direction == "forward" else (graph.rindptr, graph.rindices)
+    indptr, indices = np.asarray(indptr), np.asarray(indices)
+
+    roots = [graph.index[r] for r in root_ids if r in graph.index]
+    titles = [G.nodes[pid].get("title") for pid in ids]
+    allowed = np.array([isinstance(t, str) and bool(t.strip()) for t in titles], dtype=bool)
+    allowed[roots] = False
+    align_month = month_of(*align)
+
+    for i, root in enumerate(roots):
+        root_id = ids[root]
+        root_month = int(months[root])
+        if root_month < 0:
+            continue
+        # 计算偏移，使得 align_date 的 y = 0
+        tree_offset_y = d * (root_month - align_month)
+        x_center = i * x_spacing
+        G_sub.add_node(root_id, title=G.nodes[root_id].get("title", root_id), x=x_center, y=-tree_offset_y,
+                       color=G.nodes[root_id].get("color", "gray"), size=10)
+
+        parents, children = tree_edges(indptr, indices, months, root, allowed, direction, max_month_diff)
+        if not len(children):
+            continue
+        child_months = months[children].astype(np.int64)
+        deltas = child_months - root_month
+        # papers of the same month as the paper they come from are shifted a little
+        same_month = child_months == months[parents]
+        y_offset = np.where(same_month, d * 0.2 if direction == "forward" else -d * 0.2, 0)
+        y = -d * deltas + y_offset - tree_offset_y
+        rank = _rank_in_layer(deltas)
+        x = x_center + delta * rank * np.where(rank % 2 == 0, 1, -1)
+
+        node_ids = [f"{ids[c]}_from_{root_id}" for c in children.tolist()]
+        parent_ids = [root_id if p == root else f"{ids[p]}_from_{root_id}" for p in parents.tolist()]
+        for node_id, c, xc, yc, m in zip(node_ids, children.tolist(), x.tolist(), y.tolist(), child_months.tolist()):
+            G_sub.add_node(node_id, title=G.nodes[ids[c]].get("title", ids[c]), x=xc, y=yc,
+                           color=G.nodes[ids[c]].get("color", "gray"), size=5, time=month_label(m))
+        if direction == "forward":
+            G_sub.add_edges_from(zip(parent_ids, node_ids), color="gray")
+        else:
+            G_sub.add_edges_from(zip(node_ids, parent_ids), color="gray")
+    return G_sub
+
+
+def build_temporal_tree(G, graph, months, root_ids, **kwargs):
+    """Forward and backward trees of the roots in one graph."""
+    G_forward = build_subtree(G, graph, months, root_ids, direction="forward", **kwargs)
+    G_backward = build_subtree(G, graph, months, root_ids, direction="backward", **kwargs)
+    return nx.compose(G_forward, G_backward)
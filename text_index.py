@@ -0,0 +1,367 @@
+import argparse
+import json
+import os
+import re
+import numpy as np
+
+"""
+BM25 full-text index of the titles and abstracts (the records of First_Extraction.py / convert.py).
+
+Every record is tokenized once (lowercase alphanumeric runs, the title then the abstract) into
+integer term ids, and the postings are kept as numpy arrays sorted by term, then paper:
+
+    term_ptr    n_terms + 1     postings of term t: term_ptr[t]:term_ptr[t + 1]
+    docs, tf    n_postings      paper (row) and number of occurrences
+    pos_ptr     n_postings + 1  positions of a posting: pos_ptr[k]:pos_ptr[k + 1]
+    positions   n_tokens        token positions in the paper (the abstract starts after a gap)
+
+Papers added later form a new segment with its own arrays (nothing already indexed is rebuilt);
+a paper added again replaces the old one, which is only marked as deleted. compact() merges the
+segments into one. The terms, the paper ids and the authors are shared by all the segments.
+
+A query is a list of clauses that must all match: words, prefixes (tod*) and quoted phrases
+("matrix model"). A clause of several tokens is a phrase; with a trailing * (matrix-mod*) its
+last word is a prefix. A clause without any token (a lone "-") is ignored. The papers are ranked
+by the BM25 score of the clauses, restricted to a year (or a (first, last) range) and / or to
+papers signed by some authors.
+
+    index = TextIndex.build(iter_records('temp/papers_standardized.json'))
+    index.save('temp/text_index')
+    index = TextIndex.load('temp/text_index')
+    index.search('"matrix model" toda*', year=(1995, 1998), authors=["Edward Witten"])   # [(paper_id, score)]
+    index.add(new_papers)
+"""
+
+K1 = 1.2
+B = 0.75
+_TOKEN = re.compile(r"[a-z0-9]+")
+_CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def _split_authors(authors):
+    """A list of names (papers_standardized.json) or the raw "A, B and C" string of output.json."""
+    if not authors:
+        return []
+    if isinstance(authors, str):
+        return [name.strip() for name in re.split(r",|\band\b", authors) if name.strip()]
+    return list(authors)
+
+
+class Segment:
+    def __init__(self, offset, term_ptr, docs, tf, pos_ptr, positions):
+        self.offset = offset  # row of its first paper
+        self.term_ptr = np.asarray(term_ptr, dtype=np.int64)
+        self.docs = np.asarray(docs, dtype=np.int32)
+        self.tf = np.asarray(tf, dtype=np.int32)
+        self.pos_ptr = np.asarray(pos_ptr, dtype=np.int64)
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.saved = None  # file it was saved to (a segment never changes)
+
+    @classmethod
+    def build(cls, offset, term_lists, n_terms):
+        """term_lists: (term ids, positions) of every paper of the segment."""
+        lengths = np.array([len(terms) for terms, _ in term_lists], dtype=np.int64)
+        terms = np.concatenate([t for t, _ in term_lists] + [np.zeros(0, dtype=np.int64)])
+        positions = np.concatenate([p for _, p in term_lists] + [np.zeros(0, dtype=np.int64)])
+        docs = np.repeat(np.arange(len(term_lists), dtype=np.int64), lengths)
+        order = np.lexsort((positions, docs, terms))
+        terms, docs, positions = terms[order], docs[order], positions[order]
+
+        # one posting per (term, paper)
+        starts = np.flatnonzero(np.r_[True, (terms[1:] != terms[:-1]) | (docs[1:] != docs[:-1])]) \
+            if len(terms) else np.zeros(0, dtype=np.int64)
+        pos_ptr = np.r_[starts, len(terms)]
+        term_ptr = np.searchsorted(terms[starts], np.arange(n_terms + 1))
+        return cls(offset, term_ptr, docs[starts] + offset, np.diff(pos_ptr), pos_ptr, positions)
+
+    def postings(self, term):
+        """Row range of the postings of a term (empty for a term newer than the segment)."""
+        if term + 1 >= len(self.term_ptr):
+            return 0, 0
+        return int(self.term_ptr[term]), int(self.term_ptr[term + 1])
+
+    def arrays(self):
+        return {"offset": np.int64(self.offset), "term_ptr": self.term_ptr, "docs": self.docs,
+                "tf": self.tf, "pos_ptr": self.pos_ptr, "positions": self.positions}
+
+
+class TextIndex:
+    def __init__(self, terms=(), paper_ids=(), authors=(), doc_len=(), year=(), author_ptr=(0,),
+                 author_ids=(), live=(), segments=()):
+        self.terms = list(terms)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.paper_ids = list(paper_ids)
+        self.row_of = {pid: i for i, pid in enumerate(self.paper_ids)}
+        self.authors = list(authors)
+        self.author_index = {name: i for i, name in enumerate(self.authors)}
+        self.doc_len = np.asarray(doc_len, dtype=np.int32)
+        self.year = np.asarray(year, dtype=np.int16)  # 0: unknown
+        self.author_ptr = np.asarray(author_ptr, dtype=np.int64)
+        self.author_ids = np.asarray(author_ids, dtype=np.int32)
+        self.live = np.asarray(live, dtype=bool)
+        self.segments = list(segments)
+        self._sorted_terms = None
+        self._stats = None
+
+    @classmethod
+    def build(cls, records):
+        index = cls()
+        index.add(records)
+        return index
+
+    @property
+    def n_docs(self):
+        return len(self.paper_ids)
+
+    # ---- indexing ----
+
+    def _term_id(self, term):
+        i = self.term_ids.get(term)
+        if i is None:
+            i = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return i
+
+    def add(self, records):
+        """Index new papers as one segment; a paper_id already indexed replaces the old paper."""
+        term_lists, lengths, years, author_rows = [], [], [], []
+        paper_ids = []
+        for record in records:
+            title, abstract = tokenize(record.get("title")), tokenize(record.get("abstract"))
+            terms = np.array([self._term_id(t) for t in title + abstract], dtype=np.int64)
+            # a gap between the title and the abstract, so that no phrase spans both
+            positions = np.r_[np.arange(len(title)), np.arange(len(abstract)) + len(title) + 1].astype(np.int64)
+            term_lists.append((terms, positions))
+            lengths.append(len(terms))
+            years.append(record.get("year") or 0)
+            author_rows.append([self.author_index.setdefault(name, len(self.author_index))
+                                for name in _split_authors(record.get("authors"))])
+            paper_ids.append(record["paper_id"])
+        if not paper_ids:
+            return 0
+        self.authors.extend(list(self.author_index)[len(self.authors):])
+
+        offset = self.n_docs
+        self.segments.append(Segment.build(offset, term_lists, len(self.terms)))
+        replaced = [self.row_of[pid] for pid in paper_ids if pid in self.row_of]
+        self.live[replaced] = False
+        for i, pid in enumerate(paper_ids):
+            self.row_of[pid] = offset + i
+        # a paper given twice keeps its last version
+        new_live = np.array([self.row_of[pid] == offset + i for i, pid in enumerate(paper_ids)], dtype=bool)
+        self.paper_ids.extend(paper_ids)
+        self.doc_len = np.r_[self.doc_len, np.array(lengths, dtype=np.int32)]
+        self.year = np.r_[self.year, np.array(years, dtype=np.int16)]
+        counts = np.array([len(a) for a in author_rows], dtype=np.int64)
+        self.author_ptr = np.r_[self.author_ptr, self.author_ptr[-1] + np.cumsum(counts)]
+        self.author_ids = np.r_[self.author_ids, np.array([a for row in author_rows for a in row], dtype=np.int32)]
+        self.live = np.r_[self.live, new_live]
+        self._sorted_terms = self._stats = None
+        return len(paper_ids)
+
+    def compact(self):
+        """Merge the segments into one and drop the deleted papers' postings."""
+        if len(self.segments) <= 1 and self.live.all():
+            return
+        terms, docs, tf, positions = [], [], [], []
+        for seg in self.segments:
+            keep = self.live[seg.docs]
+            terms.append(np.repeat(np.arange(len(seg.term_ptr) - 1), np.diff(seg.term_ptr))[keep])
+            docs.append(seg.docs[keep])
+            tf.append(seg.tf[keep])
+            positions.append(seg.positions[_ranges(seg.pos_ptr[:-1][keep], seg.tf[keep])])
+        terms, docs, tf, positions = (np.concatenate(a) for a in (terms, docs, tf, positions))
+        # sort the postings by term, then paper, and move their positions with them
+        order = np.lexsort((docs, terms))
+        starts = np.r_[0, np.cumsum(tf)][:-1]
+        positions = positions[_ranges(starts[order], tf[order])]
+        terms, docs, tf = terms[order], docs[order], tf[order]
+        self.segments = [Segment(0, np.searchsorted(terms, np.arange(len(self.terms) + 1)), docs, tf,
+                                 np.r_[0, np.cumsum(tf)], positions)]
+
+    # ---- queries ----
+
+    def _bm25(self, docs, tf, df):
+        if self._stats is None:
+            n_live = int(self.live.sum())
+            self._stats = (max(n_live, 1), max(float(self.doc_len[self.live].mean()), 1.0) if n_live else 1.0)
+        n_live, avgdl = self._stats
+        idf = np.log(1 + (n_live - df + 0.5) / (df + 0.5))
+        norm = K1 * (1 - B + B * self.doc_len[docs] / avgdl)
+        return idf * tf * (K1 + 1) / (tf + norm)
+
+    def _term_postings(self, term):
+        """(docs, tf) of a term over the live papers."""
+        docs, tf = [], []
+        for seg in self.segments:
+            start, end = seg.postings(term)
+            docs.append(seg.docs[start:end])
+            tf.append(seg.tf[start:end])
+        docs, tf = np.concatenate(docs), np.concatenate(tf)
+        live = self.live[docs]
+        return docs[live], tf[live]
+
+    def _prefix_terms(self, prefix):
+        if self._sorted_terms is None:
+            terms = np.array(self.terms, dtype=str)
+            order = np.argsort(terms)
+            self._sorted_terms = (order, terms[order])
+        order, sorted_terms = self._sorted_terms
+        start, end = np.searchsorted(sorted_terms, [prefix, prefix + "\uffff"])
+        return order[start:end].tolist()
+
+    def _phrase(self, term_sets):
+        """(docs, tf) of the papers where one term of each set appears, the sets in consecutive positions."""
+        # only the papers having all the words (rarest first) are looked at position by position
+        candidates = None
+        for docs in sorted((np.unique(np.concatenate([self._term_postings(t)[0] for t in terms]))
+                            for terms in term_sets), key=len):
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+        keys = None
+        for i, terms in enumerate(term_sets):
+            term_keys = []
+            for term in terms:
+                for seg in self.segments:
+                    start, end = seg.postings(term)
+                    keep = np.isin(seg.docs[start:end], candidates, assume_unique=True)
+                    if not keep.any():
+                        continue
+                    counts = seg.tf[start:end][keep].astype(np.int64)
+                    pos = seg.positions[_ranges(seg.pos_ptr[start:end][keep], counts)].astype(np.int64)
+                    docs = np.repeat(seg.docs[start:end][keep].astype(np.int64), counts)
+                    # (paper, position of the first word of the phrase)
+                    term_keys.append(docs << 32 | (pos - i + (1 << 31)))
+            # unique: two terms of a set never share a position
+            term_keys = np.sort(np.concatenate(term_keys)) if term_keys else np.zeros(0, dtype=np.int64)
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys, assume_unique=True)
+            if not len(keys):
+                break
+        docs, tf = np.unique(keys >> 32, return_counts=True)
+        return docs, tf
+
+    def _clause(self, text, prefix=False):
+        """
+        (papers, BM25 scores) of one clause: a word, a phrase (several tokens) or a prefix; the prefix
+        of several tokens (matrix-mod*) is a phrase whose last word is a prefix.
+        """
+        tokens = tokenize(text)
+        term_sets = [[self.term_ids[t]] if t in self.term_ids else [] for t in tokens]
+        if prefix and tokens:
+            term_sets[-1] = self._prefix_terms(tokens[-1])
+        if not term_sets or not all(term_sets):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        if len(term_sets) > 1:
+            docs, tf = self._phrase(term_sets)
+            return docs, self._bm25(docs, tf, len(docs))
+
+        scores = np.zeros(self.n_docs)
+        matched = np.zeros(self.n_docs, dtype=bool)
+        for term in term_sets[0]:
+            docs, tf = self._term_postings(term)
+            scores[docs] += self._bm25(docs, tf, len(docs))
+            matched[docs] = True
+        docs = np.flatnonzero(matched)
+        return docs, scores[docs]
+
+    def filter_mask(self, year=None, authors=None):
+        """Papers of a year (or (first, last) range) and / or signed by one of the authors."""
+        mask = self.live.copy()
+        if year is not None:
+            first, last = (year, year) if np.isscalar(year) else year
+            mask &= (self.year >= first) & (self.year <= last)
+        if authors is not None:
+            wanted = [self.author_index[a] for a in ([authors] if isinstance(authors, str) else authors)
+                      if a in self.author_index]
+            rows = np.repeat(np.arange(self.n_docs), np.diff(self.author_ptr))
+            signed = np.zeros(self.n_docs, dtype=bool)
+            signed[rows[np.isin(self.author_ids, wanted)]] = True
+            mask &= signed
+        return mask
+
+    def search(self, query, limit=10, year=None, authors=None):
+        """[(paper_id, score)] of the best papers matching all the clauses of the query."""
+        clauses = [(phrase or word.rstrip("*"), word.endswith("*")) for phrase, word in _CLAUSE.findall(query)]
+        # a clause without any token (a stray "-", '"' or "*") is ignored, not an impossible match
+        clauses = [(text, prefix) for text, prefix in clauses if tokenize(text)]
+        if not clauses:
+            return []
+        scores = np.zeros(self.n_docs)
+        hits = np.zeros(self.n_docs, dtype=np.int32)
+        for text, prefix in clauses:
+            docs, clause_scores = self._clause(text, prefix)
+            scores[docs] += clause_scores
+            hits[docs] += 1
+        candidates = np.flatnonzero((hits == len(clauses)) & self.filter_mask(year, authors))
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.paper_ids[i], float(scores[i])) for i in candidates.tolist()]
+
+    # ---- storage ----
+
+    def save(self, path='temp/text_index'):
+        """meta.json, docs.npz and one segment_<k>.npz per segment (a segment already saved is kept)."""
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({"terms": self.terms, "paper_ids": self.paper_ids, "authors": self.authors,
+                       "segments": len(self.segments)}, f, ensure_ascii=False)
+        np.savez(os.path.join(path, 'docs.npz'), doc_len=self.doc_len, year=self.year,
+                 author_ptr=self.author_ptr, author_ids=self.author_ids, live=self.live)
+        for k, seg in enumerate(self.segments):
+            seg_path = os.path.join(path, f'segment_{k}.npz')
+            if seg.saved != seg_path:
+                np.savez(seg_path, **seg.arrays())
+                seg.saved = seg_path
+        k = len(self.segments)
+        while os.path.exists(os.path.join(path, f'segment_{k}.npz')):
+            os.remove(os.path.join(path, f'segment_{k}.npz'))
+            k += 1
+
+    @classmethod
+    def load(cls, path='temp/text_index'):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        docs = np.load(os.path.join(path, 'docs.npz'))
+        segments = []
+        for k in range(meta["segments"]):
+            arrays = np.load(os.path.join(path, f'segment_{k}.npz'))
+            seg = Segment(int(arrays["offset"]), arrays["term_ptr"], arrays["docs"], arrays["tf"],
+                          arrays["pos_ptr"], arrays["positions"])
+            seg.saved = os.path.join(path, f'segment_{k}.npz')
+            segments.append(seg)
+        return cls(meta["terms"], meta["paper_ids"], meta["authors"], docs["doc_len"], docs["year"],
+                   docs["author_ptr"], docs["author_ids"], docs["live"], segments)
+
+
+def _ranges(starts, counts):
+    """Concatenation of the ranges starts[i]:starts[i] + counts[i]."""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    return np.repeat(np.asarray(starts, dtype=np.int64) - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+
+if __name__ == '__main__':
+    from records import iter_records
+
+    parser = argparse.ArgumentParser(description="search the titles and abstracts (BM25)")
+    parser.add_argument("query", nargs='?')
+    parser.add_argument("--papers", default="temp/papers_standardized.json")
+    parser.add_argument("--index", default="temp/text_index")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--author", action='append')
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if os.path.exists(os.path.join(args.index, 'meta.json')):
+        index = TextIndex.load(args.index)
+    else:
+        index = TextIndex.build(iter_records(args.papers))
+        index.save(args.index)
+        print(f"Indexed {index.n_docs} papers in {args.index}")
+    if args.query:
+        for paper_id, score in index.search(args.query, args.limit, args.year, args.author):
+            print(f"{paper_id}  {score:6.2f}")